@@ -23,9 +23,9 @@ from uml import (
     OutputPin,
     Parameter,
     flow_final_node,
-    labop_hash,
     literal,
 )
+from uml.utils import identity_hash
 
 
 class ActivityNodeExecution(inner.ActivityNodeExecution):
@@ -33,7 +33,21 @@ class ActivityNodeExecution(inner.ActivityNodeExecution):
         super().__init__(*args, **kwargs)
 
     def __hash__(self):
-        return labop_hash(self.identity) + hash(self.get_node())
+        # Python caches the hash of a str, so this does not recompute a digest
+        return hash(self.identity)
+
+    def invocation_hash(self) -> int:
+        """
+        Deterministic hash of the execution, used by compute_output() to name
+        outputs.  The digests of identities are memoized, and the node is
+        hashed by its URI rather than looked up.
+
+        Returns
+        -------
+        int
+            hash of the execution
+        """
+        return hash(identity_hash(self.identity) + hash(identity_hash(str(self.node))))
 
     def get_node(self) -> ActivityNode:
         return self.node.lookup()
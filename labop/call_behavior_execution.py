@@ -14,11 +14,11 @@ from uml import (
     CallBehaviorAction,
     ObjectFlow,
     Parameter,
-    labop_hash,
     literal,
 )
 from uml.ordered_property_value import OrderedPropertyValue
 from uml.output_pin import OutputPin
+from uml.utils import identity_hash
 
 from .activity_edge_flow import ActivityEdgeFlow
 from .activity_node_execution import ActivityNodeExecution
@@ -31,10 +31,13 @@ class CallBehaviorExecution(inner.CallBehaviorExecution, ActivityNodeExecution):
         super().__init__(*args, **kwargs)
 
     def __hash__(self):
-        return (
-            labop_hash(self.identity)
-            + hash(self.get_node())
-            + sum([hash(pv) for pv in self.parameter_values()])
+        return hash(self.identity)
+
+    def invocation_hash(self) -> int:
+        return hash(
+            identity_hash(self.identity)
+            + hash(identity_hash(str(self.node)))
+            + sum([hash(identity_hash(pv.identity)) for pv in self.parameter_values()])
         )
 
     def get_behavior(self) -> Behavior:
@@ -83,7 +86,9 @@ class CallBehaviorExecution(inner.CallBehaviorExecution, ActivityNodeExecution):
         # )
 
         input_map = self.input_parameter_map()
-        value = behavior.compute_output(input_map, parameter, sample_format, hash(self))
+        value = behavior.compute_output(
+            input_map, parameter, sample_format, self.invocation_hash()
+        )
 
         return value
 
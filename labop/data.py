@@ -4,22 +4,71 @@ Functions related to data i/o in connection with a protocol execution trace.
 This file monkey-patches the imported labop classes with data handling functions.
 """
 
+import base64
+import copy
+import functools
+import io
 import json
 import logging
-from typing import Dict
+from typing import Dict, Optional, Union
 from urllib.parse import quote, unquote
 
+import numpy as np
+import pandas as pd
 import sbol3
 import xarray as xr
 
 from labop.strings import Strings
+from labop.utils.plate_coordinates import coordinates_to_row_col_arrays
 
 l = logging.getLogger(__file__)
 l.setLevel(logging.ERROR)
 
+# Encoding used by serialize_sample_format() for xarray data, either Strings.JSON or Strings.NPZ
+SERIALIZATION_FORMAT = Strings.JSON
 
-def serialize_sample_format(data):
+# NPZ encoded data starts with this tag, JSON encoded data is untagged
+NPZ_TAG = f"{Strings.NPZ}:"
+
+# numpy dtype kinds that np.save() writes without pickling
+NPZ_DTYPE_KINDS = "biufcmMSU"
+
+# Maximum number of deserialized values kept by cached_deserialize_sample_format()
+DESERIALIZATION_CACHE_SIZE = 256
+
+
+def set_serialization_format(serialization_format: str):
+    """
+    Set the encoding used by serialize_sample_format() for xarray data.
+    Data is always deserialized according to its own encoding, so documents with mixed encodings can be loaded.
+
+    Parameters
+    ----------
+    serialization_format : str
+        Strings.JSON (URL quoted JSON, the default) or Strings.NPZ (base64 encoded compressed numpy arrays)
+
+    Returns
+    -------
+    str
+        the previous encoding, so that it can be restored
+    """
+    global SERIALIZATION_FORMAT
+    if serialization_format not in [Strings.JSON, Strings.NPZ]:
+        raise ValueError(f"Unknown serialization format: {serialization_format}")
+    previous_format = SERIALIZATION_FORMAT
+    SERIALIZATION_FORMAT = serialization_format
+    return previous_format
+
+
+def serialize_sample_format(data, serialization_format: Optional[str] = None):
+    serialization_format = (
+        serialization_format if serialization_format else SERIALIZATION_FORMAT
+    )
     if isinstance(data, xr.DataArray) or isinstance(data, xr.Dataset):
+        if serialization_format == Strings.NPZ:
+            encoded = encode_npz(data)
+            if encoded is not None:
+                return encoded
         data_dict = data.to_dict()
     elif isinstance(data, Dict):
         data_dict = data
@@ -30,50 +79,289 @@ def serialize_sample_format(data):
 
 def deserialize_sample_format(
     data: str, parent: sbol3.Identified = None, order=Strings.ROW_DIRECTION
+):
+    """
+    Deserialize data written by serialize_sample_format().
+    Results are memoized by cached_deserialize_sample_format(), so repeated calls with the same serialized value
+    do not parse it again, and reassigning the serialized property (e.g., SampleArray.initial_contents) results in
+    a cache miss.  xarray results are shallow copies that share values with the cache, so must not be modified in place.
+
+    Parameters
+    ----------
+    data : str
+        serialized data
+    parent : sbol3.Identified, optional
+        object holding the serialized data, used to name the result
+    order : str, optional
+        order of the samples, by default Strings.ROW_DIRECTION
+
+    Returns
+    -------
+    Union[xr.DataArray, xr.Dataset, dict]
+        deserialized data
+    """
+    deserialized = cached_deserialize_sample_format(
+        data, parent.identity if parent else None, order
+    )
+    if isinstance(deserialized, xr.DataArray) or isinstance(deserialized, xr.Dataset):
+        return deserialized.copy(deep=False)
+    return copy.deepcopy(deserialized)
+
+
+@functools.lru_cache(maxsize=DESERIALIZATION_CACHE_SIZE)
+def cached_deserialize_sample_format(
+    data: str, parent_identity: Optional[str], order: str
 ):
     try:
-        json_data = json.loads(unquote(data))
-        try:
-            xarray_data = xr.DataArray.from_dict(json_data)
-            if parent:
-                xarray_data.name = parent.identity
-            return sort_samples(xarray_data, sample_format=Strings.XARRAY, order=order)
-        except:
-            try:
+        if data.startswith(NPZ_TAG):
+            xarray_data = decode_npz(data)
+        else:
+            json_data = json.loads(unquote(data))
+            if isinstance(json_data, dict) and "data_vars" in json_data:
                 xarray_data = xr.Dataset.from_dict(json_data)
-                if Strings.SOURCE in xarray_data.coords:
-                    xarray_data.coords[Strings.SOURCE] = [parent.identity]
-                return sort_samples(
-                    xarray_data, sample_format=Strings.XARRAY, order=order
-                )
-            except:
+            elif (
+                isinstance(json_data, dict)
+                and "dims" in json_data
+                and "data" in json_data
+            ):
+                xarray_data = xr.DataArray.from_dict(json_data)
+            else:
                 return sort_samples(json_data, sample_format=Strings.JSON, order=order)
+
+        if isinstance(xarray_data, xr.DataArray):
+            if parent_identity:
+                xarray_data.name = parent_identity
+        elif Strings.SOURCE in xarray_data.coords:
+            xarray_data.coords[Strings.SOURCE] = [parent_identity]
+        return sort_samples(xarray_data, sample_format=Strings.XARRAY, order=order)
     except Exception as e:
         raise Exception(f"Could not determine format of data: {e}")
 
 
+def encode_npz(data: Union[xr.DataArray, xr.Dataset]) -> Optional[str]:
+    """
+    Encode the variables of data as compressed numpy arrays, with a JSON header for names, dims and attrs.
+
+    Parameters
+    ----------
+    data : Union[xr.DataArray, xr.Dataset]
+        data to encode
+
+    Returns
+    -------
+    Optional[str]
+        NPZ_TAG followed by the base64 encoded arrays, or None if data has values that need pickling (e.g., None)
+    """
+    arrays = {}
+
+    def encode_variable(key: str, name, variable: xr.Variable):
+        values = variable.values
+        if values.dtype.kind == "O" and all(isinstance(v, str) for v in values.flat):
+            values = values.astype(str)
+        if values.dtype.kind not in NPZ_DTYPE_KINDS:
+            raise TypeError(f"Cannot encode values of dtype {values.dtype}")
+        arrays[key] = values
+        return [name, list(variable.dims), variable.attrs]
+
+    try:
+        header = {
+            "coords": [
+                encode_variable(f"coord{i}", name, coord.variable)
+                for i, (name, coord) in enumerate(data.coords.items())
+            ],
+            "attrs": data.attrs,
+        }
+        if isinstance(data, xr.DataArray):
+            header["name"] = data.name
+            header["data"] = encode_variable("data", None, data.variable)
+        else:
+            header["data_vars"] = [
+                encode_variable(f"data_var{i}", name, variable.variable)
+                for i, (name, variable) in enumerate(data.data_vars.items())
+            ]
+        arrays["header"] = np.array(json.dumps(header))
+    except TypeError as e:
+        l.debug(f"Falling back to JSON serialization: {e}")
+        return None
+
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **arrays)
+    return NPZ_TAG + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def decode_npz(data: str) -> Union[xr.DataArray, xr.Dataset]:
+    """
+    Decode data encoded by encode_npz()
+
+    Parameters
+    ----------
+    data : str
+        NPZ_TAG followed by the base64 encoded arrays
+
+    Returns
+    -------
+    Union[xr.DataArray, xr.Dataset]
+        decoded data
+    """
+    buffer = io.BytesIO(base64.b64decode(data[len(NPZ_TAG) :]))
+    with np.load(buffer, allow_pickle=False) as arrays:
+        header = json.loads(str(arrays["header"]))
+        coords = {
+            name: xr.Variable(dims, arrays[f"coord{i}"], attrs)
+            for i, (name, dims, attrs) in enumerate(header["coords"])
+        }
+        if "data" in header:
+            _, dims, attrs = header["data"]
+            return xr.DataArray(
+                xr.Variable(dims, arrays["data"], attrs),
+                coords=coords,
+                name=header["name"],
+                attrs=header["attrs"],
+            )
+        else:
+            data_vars = {
+                name: xr.Variable(dims, arrays[f"data_var{i}"], attrs)
+                for i, (name, dims, attrs) in enumerate(header["data_vars"])
+            }
+            return xr.Dataset(data_vars, coords=coords, attrs=header["attrs"])
+
+
+def label_row_col_ranks(locations: np.ndarray) -> tuple:
+    """
+    Rank sample locations that are not plate coordinates by their first
+    character and by the rest of the label, zero padded to two characters,
+    e.g., ("B1", "A10", "A2") are ranked ([1, 0, 0], [0, 2, 1]).
+
+    Parameters
+    ----------
+    locations : np.ndarray
+        location labels
+
+    Returns
+    -------
+    tuple
+        row ranks and column ranks
+    """
+    labels = [str(location) for location in locations.ravel()]
+    rows = np.unique([label[:1] for label in labels], return_inverse=True)[1]
+    cols = np.unique(
+        [label[1:].rjust(2, "0") for label in labels], return_inverse=True
+    )[1]
+    return rows, cols
+
+
 def sort_samples(data, sample_format=Strings.XARRAY, order=Strings.ROW_DIRECTION):
     if sample_format == Strings.XARRAY:
-        if Strings.LOCATION in data.coords:
-            data["row"] = data.coords["location"].str.slice(0, 1)
-            data["col"] = data.coords["location"].str.slice(1).str.pad(2, fillchar="0")
+        if Strings.LOCATION in data.coords and data.coords[Strings.LOCATION].ndim == 1:
+            location = data.coords[Strings.LOCATION]
+            try:
+                rows, cols = coordinates_to_row_col_arrays(
+                    tuple(location.values.tolist())
+                )
+            except Exception as e:
+                l.debug(f"Sorting sample locations as labels: {e}")
+                rows, cols = label_row_col_ranks(location.values)
+            # np.lexsort sorts by the last key first
             if order == Strings.ROW_DIRECTION:
                 # for each row, for each col
                 # A1->A12, B1->B12, ...
-                data = data.sortby(["row", "col"])
+                index = np.lexsort((cols, rows))
             elif order == Strings.REVERSE_ROW_DIRECTION:
                 # for each reverse(row) for each col
                 # A12->A1, B12->B1, ...
-                data = data.sortby("col", ascending=False).sortby("row")
-
+                index = np.lexsort((-cols, rows))
             elif order == Strings.COLUMN_DIRECTION:
                 # for each col for each row
                 # A1->H1, A2->H2, ...
-                data = data.sortby("row").sortby("col")
+                index = np.lexsort((rows, cols))
             elif order == Strings.REVERSE_COLUMN_DIRECTION:
                 # for each reverse(col) for each row
                 # H1->A1, H2->A2, ...
-                data = data.sortby("row", ascending=False).sortby("col")
-            data = data.drop_vars(["row", "col"])
+                index = np.lexsort((-rows, cols))
+            else:
+                return data
+            if np.any(index[1:] < index[:-1]):
+                data = data.isel({location.dims[0]: index})
 
     return data
+
+
+def document_index(document: sbol3.Document) -> Dict[str, sbol3.Identified]:
+    """
+    Index the objects of document by identity and display_id, so that
+    index.get(key) is document.find(key), without searching the document once
+    per key.  The index is a snapshot of the document, so it is built once per
+    humanize call rather than kept while the document changes.
+
+    Parameters
+    ----------
+    document : sbol3.Document
+        document to index
+
+    Returns
+    -------
+    Dict[str, sbol3.Identified]
+        objects by identity and display_id
+    """
+    index = {}
+
+    def add(obj: sbol3.Identified):
+        index.setdefault(obj.identity, obj)
+        if hasattr(obj, "display_id") and obj.display_id:
+            index.setdefault(obj.display_id, obj)
+
+    # Like document.find(), match the top level objects before their children
+    for obj in document.objects:
+        add(obj)
+    stack = list(reversed(document.objects))
+    while stack:
+        obj = stack.pop()
+        add(obj)
+        # Children in the order that Identified.find() searches them
+        children = [
+            child for children in obj._owned_objects.values() for child in children
+        ]
+        stack.extend(reversed(children))
+    return index
+
+
+def humanize_values(
+    values: np.ndarray, index: Dict[str, sbol3.Identified]
+) -> Optional[np.ndarray]:
+    """
+    Replace the values that identify objects of a document by the objects'
+    display names, str(object).  Each unique value is looked up once, and the
+    values are replaced in a single pass.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        values to humanize
+    index : Dict[str, sbol3.Identified]
+        index of the document, from document_index()
+
+    Returns
+    -------
+    Optional[np.ndarray]
+        humanized values, or None if no values identify an object
+    """
+    if values.dtype.kind not in "OUS" or values.size == 0:
+        return None
+    flat = values.ravel()
+    codes, uniques = pd.factorize(flat)
+    names = [
+        str(index[u]) if isinstance(u, str) and u in index else None for u in uniques
+    ]
+    if all(name is None for name in names):
+        return None
+
+    names = np.array(
+        [u if name is None else name for u, name in zip(uniques, names)], dtype=object
+    )
+    humanized = flat.astype(object)
+    # Missing values have code -1, and are kept
+    found = codes >= 0
+    humanized[found] = names[codes[found]]
+    if values.dtype.kind != "O":
+        humanized = humanized.astype(str)
+    return humanized.reshape(values.shape)
@@ -3,6 +3,7 @@ The Dataset class defines the functions corresponding to the dynamically generat
 """
 
 import os
+from typing import Dict, List, Optional, Union
 
 import numpy as np
 import pandas as pd
@@ -10,7 +11,7 @@ import xarray as xr
 
 import labop.inner as inner
 
-from .data import sort_samples
+from .data import document_index, humanize_values, sort_samples
 from .strings import Strings
 
 
@@ -18,37 +19,84 @@ class Dataset(inner.Dataset):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-    def to_dataset(self, sample_format=Strings.XARRAY, humanize=False):
+    def components(self) -> List[Union["SampleData", "SampleMetadata"]]:
+        """
+        SampleData and SampleMetadata of the dataset and its nested datasets,
+        in the order that they are merged by to_dataset().  Each component is
+        included once, even if it is linked by several nested datasets.
+
+        Returns
+        -------
+        List[Union[labop.SampleData, labop.SampleMetadata]]
+            components of the dataset
+        """
+        components = []
+        visited = set()
+        stack = [self]
+        while stack:
+            item = stack.pop()
+            if id(item) in visited:
+                continue
+            visited.add(id(item))
+            if isinstance(item, Dataset):
+                children = (
+                    ([item.data] if item.data else [])
+                    + list(item.metadata)
+                    + [d.lookup() for d in item.dataset]
+                    + [m.lookup() for m in item.linked_metadata]
+                )
+                stack.extend(reversed(children))
+            else:
+                components.append(item)
+        return components
+
+    def to_dataset(
+        self,
+        sample_format=Strings.XARRAY,
+        humanize=False,
+        variables: Optional[List[str]] = None,
+        samples: Optional[Dict[str, List]] = None,
+    ):
         """
         Join the self.data and self.metadata into a single xarray dataset.
 
+        The data and metadata of nested datasets are merged once, rather than
+        once per level of nesting.  Views of the dataset are materialized by
+        selecting variables and samples, which only merges the selection.
+
         Parameters
         ----------
         self : labop.Dataset
             Dataset comprising data and metadata.
+        humanize : bool
+            replace URIs with the names of the objects that they identify
+        variables : Optional[List[str]]
+            only include these variables, by their names before humanizing
+            (default: all variables)
+        samples : Optional[Dict[str, List]]
+            only include the samples with these coordinates, for each
+            dimension, e.g., {Strings.LOCATION: ["A1", "A2"]} (default: all
+            samples)
         """
-        data = (
-            [self.data.to_data_array(sample_format=sample_format)] if self.data else []
-        )
-        datasets = (
-            [d.lookup().to_dataset(sample_format=sample_format) for d in self.dataset]
-            if self.dataset
-            else []
-        )
-        metadata = (
-            [m.to_data_array(sample_format=sample_format) for m in self.metadata]
-            if self.metadata
-            else []
-        )
-        linked_metadata = (
-            [
-                m.lookup().to_data_array(sample_format=sample_format)
-                for m in self.linked_metadata
-            ]
-            if self.linked_metadata
-            else []
-        )
-        to_merge = data + metadata + datasets + linked_metadata
+        to_merge = []
+        for component in self.components():
+            array = component.to_data_array(sample_format=sample_format)
+            if variables is not None:
+                if isinstance(array, xr.Dataset):
+                    array = array[[v for v in array.data_vars if v in variables]]
+                    if len(array.data_vars) == 0:
+                        continue
+                elif array.name not in variables:
+                    continue
+            if samples is not None:
+                array = array.isel(
+                    {
+                        dim: np.flatnonzero(array.indexes[dim].isin(values))
+                        for dim, values in samples.items()
+                        if dim in array.indexes
+                    }
+                )
+            to_merge.append(array)
         ds = xr.merge(to_merge)
         if humanize:
             ds = self.humanize(dataset=ds, sample_format=sample_format)
@@ -67,41 +115,22 @@ class Dataset(inner.Dataset):
             )  # to_dataset will call this function again with an xaray.Dataset for dataset
 
         if sample_format == Strings.XARRAY:
-            vars = list(dataset.data_vars.keys())
-            var_map = {}
-            for var in vars:
-                var_obj = self.document.find(var)
-                if var_obj is not None:
-                    var_map[var] = str(var_obj.name)
-                values = dataset[var]
-                if (
-                    values.dtype.str == "<U102"
-                    or values.dtype.str == "|O"
-                    or values.dtype.str == "<U95"
-                ):
-                    # unique_values = set(
-                    #     values.stack(i=values.coords._names)
-                    #     .dropna("i")
-                    #     .data.tolist()
-                    # )
-                    unique_values = np.unique(
-                        dataset[var].dropna(dim=Strings.LOCATION).data
-                    ).tolist()
-                    for old in unique_values:
-                        val_obj = self.document.find(old)
-                        if val_obj is not None:
-                            new = str(val_obj)
-                            values = values.astype("str").str.replace(old, str(new))
-                    dataset = dataset.assign({var: values})
+            index = document_index(self.document)
+            var_map = {
+                var: str(index[var].name)
+                for var in dataset.data_vars
+                if isinstance(var, str) and var in index
+            }
+            for var in list(dataset.data_vars):
+                values = humanize_values(dataset[var].data, index)
+                if values is not None:
+                    dataset = dataset.assign({var: dataset[var].copy(data=values)})
 
             dataset = dataset.rename(var_map)
-            for c in dataset.coords._names:
-                unique_values = np.unique(dataset[c].data).tolist()
-                for old in unique_values:
-                    val_obj = self.document.find(old)
-                    if val_obj is not None:
-                        new = str(val_obj)
-                        dataset[c] = dataset[c].str.replace(old, str(new))
+            for c in list(dataset.coords):
+                values = humanize_values(dataset[c].data, index)
+                if values is not None:
+                    dataset = dataset.assign_coords({c: dataset[c].copy(data=values)})
             return dataset
         else:
             return dataset
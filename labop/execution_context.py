@@ -1,4 +1,5 @@
-from typing import Dict, Iterable, List, Optional
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
 
 import sbol3
 
@@ -12,7 +13,6 @@ from uml import (
     ActivityParameterNode,
     CallBehaviorAction,
     ControlFlow,
-    LiteralSpecification,
     ObjectFlow,
     OutputPin,
     Pin,
@@ -45,16 +45,27 @@ class ExecutionContext(object):
         self.parameter_values = parameter_values
         self.candidate_clusters = {}
         self.incoming_edge_tokens: Dict[
-            ActivityNode, Dict[ActivityEdge, LiteralSpecification]
-        ] = {}  # Maps node -> edge -> value
+            ActivityNode, Dict[ActivityEdge, Deque["ActivityEdgeFlow"]]
+        ] = {}  # Maps node -> edge -> queue of tokens waiting on the edge
         self.input_edges = []  # FIXME remove?
         self.output_edges = []  # FIXME remove?
-        self.tokens = []  # no tokens to start
+        self.tokens: Dict[
+            int, "ActivityEdgeFlow"
+        ] = {}  # Live tokens keyed by id(), no tokens to start
         self.ready = []
+        # Incremental readiness: node -> edges that must hold a token (see ActivityNode.enabling_edges())
+        # and node -> number of those edges that currently hold a token
+        self.enabling_edges: Dict[ActivityNode, Optional[Set[ActivityEdge]]] = {}
+        self.satisfied_edge_count: Dict[ActivityNode, int] = {}
         self.nodes = []
         """Reference to the shared execution_trace """
         self.execution_trace = execution_trace
         self.call_pins = []  # FIXME remove?
+        # Index of execution_trace.activity_call_edge by source and target identity,
+        # shared by all contexts of the execution_trace (see add_call_edge())
+        self.call_edge_index: Tuple[
+            Dict[str, List[ActivityEdge]], Dict[str, List[ActivityEdge]]
+        ] = (parent_context.call_edge_index if parent_context else ({}, {}))
 
         nodes_to_initialize: List[ActivityNode] = []
 
@@ -70,13 +81,13 @@ class ExecutionContext(object):
             execution_trace.activity_call_node.append(self.initial_node)
             execution_trace.activity_call_node.append(self.final_node)
 
-            self.execution_trace.activity_call_edge.append(
+            self.add_call_edge(
                 ControlFlow(source=self.initial_node, target=self.invoke_activity_node)
             )
-            self.execution_trace.activity_call_edge.append(
+            self.add_call_edge(
                 ControlFlow(source=self.invoke_activity_node, target=self.final_node)
             )
-            self.execution_trace.activity_call_edge.append(
+            self.add_call_edge(
                 ControlFlow(source=self.initial_node, target=self.final_node)
             )
 
@@ -118,7 +129,7 @@ class ExecutionContext(object):
         for node in nodes_to_initialize:
             self.incoming_edge_tokens[node] = {}
             for e in self.incoming_edges(node):
-                self.incoming_edge_tokens[node][e] = []
+                self.add_incoming_edge(node, e)
             # if isinstance(node, ActivityParameterNode) and node.is_input():
             #     # if matching input parameters, then add dummy edge value
             #     param_values = [
@@ -164,7 +175,7 @@ class ExecutionContext(object):
                     input = ObjectFlow(
                         source=value_pin, target=self.invoke_activity_node
                     )
-                    self.execution_trace.activity_call_edge.append(input)
+                    self.add_call_edge(input)
                     self.input_edges.append(input)  # FIXME remove?
         for o in activity.get_parameters(output_only=True):
             output_pin = OutputPin(
@@ -177,17 +188,112 @@ class ExecutionContext(object):
 
             # Connect to CallBehaviorAction
             end = ObjectFlow(source=self.invoke_activity_node, target=output_pin)
-            self.execution_trace.activity_call_edge.append(end)
+            self.add_call_edge(end)
             self.output_edges.append(end)  # FIXME remove?
 
+    def produce_tokens(self, tokens: List["ActivityEdgeFlow"]) -> Set[ActivityNode]:
+        """Queue new tokens on the incoming edges of their targets
+
+        Parameters
+        ----------
+        tokens: tokens created for this context
+
+        Returns
+        -------
+        Set of ActivityNodes that received a token
+        """
+        targets = set()
+        for token in tokens:
+            target = token.get_target()
+            edge = token.get_edge()
+            queue = self.incoming_edge_tokens[target][edge]
+            queue.append(token)
+            self.tokens[id(token)] = token
+            if len(queue) == 1 and edge in (self.enabling_edges.get(target) or ()):
+                self.satisfied_edge_count[target] += 1
+            targets.add(target)
+        return targets
+
+    def consume_token(
+        self, node: ActivityNode, edge: ActivityEdge
+    ) -> Optional["ActivityEdgeFlow"]:
+        """Remove the oldest token waiting on edge into node
+
+        Parameters
+        ----------
+        node: target of the edge
+        edge: incoming edge of node
+
+        Returns
+        -------
+        The consumed token, or None if the edge has no tokens
+        """
+        queue = self.incoming_edge_tokens[node][edge]
+        if len(queue) == 0:
+            return None
+        token = queue.popleft()
+        self.tokens.pop(id(token), None)
+        if len(queue) == 0 and edge in (self.enabling_edges.get(node) or ()):
+            self.satisfied_edge_count[node] -= 1
+        return token
+
+    def add_incoming_edge(self, node: ActivityNode, edge: ActivityEdge):
+        """Add an empty token queue for edge into node
+
+        Parameters
+        ----------
+        node: target of the edge
+        edge: incoming edge of node
+        """
+        if node not in self.incoming_edge_tokens:
+            self.incoming_edge_tokens[node] = {}
+        self.incoming_edge_tokens[node][edge] = deque()
+        # The edges enabling node may have changed, so recompute on the next is_ready()
+        self.enabling_edges.pop(node, None)
+
+    def is_ready(self, node: ActivityNode, engine: "ExecutionEngine") -> bool:
+        """Check whether node is enabled by the tokens on its incoming edges
+
+        Parameters
+        ----------
+        node: node to check
+        engine: engine executing the context
+
+        Returns
+        -------
+        bool if node is enabled
+        """
+        edge_tokens = self.incoming_edge_tokens[node]
+        if node not in self.enabling_edges:
+            edges = node.enabling_edges(edge_tokens, engine)
+            self.enabling_edges[node] = edges
+            if edges is not None:
+                self.satisfied_edge_count[node] = len(
+                    [e for e in edges if len(edge_tokens[e]) > 0]
+                )
+        edges = self.enabling_edges[node]
+        if edges is None:
+            return node.enabled(edge_tokens, engine)
+        return self.satisfied_edge_count[node] == len(edges)
+
+    def add_call_edge(self, edge: ActivityEdge):
+        """Add an edge to the execution_trace.activity_call_edge and index it by its source and target
+
+        Parameters
+        ----------
+        edge: ActivityEdge connecting nodes across execution contexts
+        """
+        self.execution_trace.activity_call_edge.append(edge)
+        edges_by_source, edges_by_target = self.call_edge_index
+        edges_by_source.setdefault(str(edge.source), []).append(edge)
+        edges_by_target.setdefault(str(edge.target), []).append(edge)
+
     def outgoing_edges(self, node):
         out_edges = []
         # if node in self.activity.nodes:
         if self.activity:
             out_edges += self.activity.outgoing_edges(node)
-        out_edges += [
-            e for e in self.execution_trace.activity_call_edge if e.get_source() == node
-        ]
+        out_edges += self.call_edge_index[0].get(node.identity, [])
         return out_edges
 
     def incoming_edges(self, node):
@@ -195,9 +301,7 @@ class ExecutionContext(object):
         # if node in self.activity.nodes:
         if self.activity:
             in_edges += self.activity.incoming_edges(node)
-        in_edges += [
-            e for e in self.execution_trace.activity_call_edge if e.get_target() == node
-        ]
+        in_edges += self.call_edge_index[1].get(node.identity, [])
         return in_edges
 
     def get_invocation_edge(self, source: ActivityNode, target: ActivityNode):
@@ -206,8 +310,8 @@ class ExecutionContext(object):
                 iter(
                     [
                         e
-                        for e in self.execution_trace.activity_call_edge
-                        if e.get_source() == source and e.get_target() == target
+                        for e in self.call_edge_index[0].get(source.identity, [])
+                        if e.target == target.identity
                     ]
                 )
             )
@@ -305,10 +409,8 @@ class ExecutionContext(object):
                 input_flow = ObjectFlow(
                     source=edge.get_source(), target=activity_parameter_node
                 )
-                self.execution_trace.activity_call_edge.append(input_flow)
-                activity_context.incoming_edge_tokens[activity_parameter_node][
-                    input_flow
-                ] = []
+                self.add_call_edge(input_flow)
+                activity_context.add_incoming_edge(activity_parameter_node, input_flow)
                 self.input_edges.append(input_flow)
 
         # parent.CBA -> child.InitialNode
@@ -317,8 +419,8 @@ class ExecutionContext(object):
             source=call_behavior_action,
             target=init,
         )
-        activity_context.execution_trace.activity_call_edge.append(start)
-        activity_context.incoming_edge_tokens[init][start] = []
+        activity_context.add_call_edge(start)
+        activity_context.add_incoming_edge(init, start)
 
         # Control edges with call_behavior_action as source are replicated with the activity_context.activity as source
         for edge in self.outgoing_edges(call_behavior_action):
@@ -331,10 +433,8 @@ class ExecutionContext(object):
                         source=activity_context.activity.final(),
                         target=t,
                     )
-                    activity_context.execution_trace.activity_call_edge.append(end)
-                    if t not in self.incoming_edge_tokens:
-                        self.incoming_edge_tokens[t] = {}
-                    self.incoming_edge_tokens[t][end] = []
+                    activity_context.add_call_edge(end)
+                    self.add_incoming_edge(t, end)
 
             elif isinstance(edge, ObjectFlow):
                 try:
@@ -361,8 +461,8 @@ class ExecutionContext(object):
                         activity_parameter_node.get_parameter().name
                     ),
                 )
-                self.execution_trace.activity_call_edge.append(output)
-                self.incoming_edge_tokens[output.get_target()][output] = []
+                self.add_call_edge(output)
+                self.add_incoming_edge(output.get_target(), output)
                 self.output_edges.append(output)
         return activity_context
 
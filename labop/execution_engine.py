@@ -2,8 +2,11 @@ import datetime
 import hashlib
 import logging
 import os
+import time
 import uuid
 from abc import ABC
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from typing import Callable, Dict, List, Optional, Tuple, Union
 
 import pandas as pd
@@ -11,6 +14,7 @@ import sbol3
 from numpy import record
 
 from labop.behavior_execution import BehaviorExecution
+from labop.data import set_serialization_format
 from labop.execution_context import ExecutionContext
 from labop.strings import Strings
 from labop_convert.behavior_dynamics import SampleProvenanceObserver
@@ -23,7 +27,7 @@ from uml.input_pin import InputPin
 from uml.object_flow import ObjectFlow
 from uml.output_pin import OutputPin
 from uml.pin import Pin
-from uml.utils import WellFormednessIssue, WellformednessLevels, literal
+from uml.utils import WellFormednessIssue, WellformednessLevels, cached_lookups, literal
 from uml.value_pin import ValuePin
 
 from .activity_edge_flow import ActivityEdgeFlow
@@ -74,6 +78,14 @@ class ExecutionEngine(ABC):
         out_dir: str = "out",
         dataset_file: str = None,  # type: ignore
         track_samples=True,
+        well_formedness_cache_dir: Optional[str] = None,
+        remove_duplicates: bool = True,
+        serialization_format: str = Strings.JSON,
+        parallel: bool = False,
+        max_workers: Optional[int] = None,
+        render_sample_graph: bool = False,
+        render_workers: int = 0,
+        persist_sample_graph: bool = False,
     ):
         self.exec_counter = 0
         self.variable_counter = 0
@@ -123,9 +135,35 @@ class ExecutionEngine(ABC):
         self.data_id_map = {}
         self.candidate_clusters = {}
         self.track_samples = track_samples
-
+        # Directory where Protocol.is_well_formed() reports persist between sessions
+        self.well_formedness_cache_dir = well_formedness_cache_dir
+        # Set to False to skip Protocol.remove_duplicates() for documents known not to have duplicate nodes,
+        # e.g., documents that were not read from N-Triples
+        self.remove_duplicates = remove_duplicates
+        # Encoding of the sample data created during execution, see labop.data.set_serialization_format()
+        self.serialization_format = serialization_format
+        # Encoding in use before execution, restored when execution ends
+        self.previous_serialization_format: Optional[str] = None
+        self.batch_timing: Dict[str, float] = {}  # Timing of the last execute_many()
+        # When set to True, ready CallBehaviorActions whose outputs are computed by a primitive compute_output
+        # function are computed concurrently by up to max_workers threads, see step()
+        self.parallel = parallel
+        self.max_workers = max_workers
+
+        # When set to True, the sample provenance graph is rendered to out_dir after each step that changes it,
+        # in render_workers background threads if render_workers > 0.  The snapshots of the graph can also be
+        # rendered after execution with prov_observer.render_snapshots()
+        # When persist_sample_graph is set to True, the graph is written to out_dir as it grows, and its node
+        # data is memory-mapped rather than held in memory, see SampleProvenanceObserver.load()
         self.prov_observer = (
-            SampleProvenanceObserver(self.out_dir) if self.track_samples else None
+            SampleProvenanceObserver(
+                self.out_dir,
+                render=render_sample_graph,
+                render_workers=render_workers,
+                persist=persist_sample_graph,
+            )
+            if self.track_samples
+            else None
         )
 
         if self.specializations is None or (
@@ -198,6 +236,10 @@ class ExecutionEngine(ABC):
         # setup possible issues
         self.issues[id] = []
 
+        self.previous_serialization_format = set_serialization_format(
+            self.serialization_format
+        )
+
         if self.use_defined_primitives:
             # Define the compute_output function for known primitives
             Primitive.initialize_primitive_compute_output(doc)
@@ -242,6 +284,21 @@ class ExecutionEngine(ABC):
         for specialization in self.specializations:
             specialization.on_end(self.ex)
 
+        if self.prov_observer is not None:
+            self.prov_observer.wait_for_renders()
+
+        self.restore_serialization_format()
+
+    def restore_serialization_format(self):
+        """
+        Restore the encoding of sample data that was in use before initialize(),
+        so that the serialization_format of this engine does not apply to other
+        engines or to sample data created outside of execution.
+        """
+        if self.previous_serialization_format is not None:
+            set_serialization_format(self.previous_serialization_format)
+            self.previous_serialization_format = None
+
     def execute(
         self,
         protocol: Protocol,
@@ -251,6 +308,7 @@ class ExecutionEngine(ABC):
         start_time: datetime.datetime = None,
         execution_context=None,
         overwrite_execution=False,  # When True, remove old execution if it exists
+        validate: bool = True,
     ) -> ProtocolExecution:
         """Execute the given protocol against the provided parameters
 
@@ -261,32 +319,115 @@ class ExecutionEngine(ABC):
         parameter_values: List of all input parameter values (if any)
         id: display_id or URI to be used as the name of this execution; defaults to a UUID display_id
         start_time: Start time for the execution
+        validate: Check the protocol with validate_protocol() before executing it
 
         Returns
         -------
         ProtocolExecution containing a record of the execution
         """
-        protocol.remove_duplicates()  # FIXME needed because reading nt files with sbol3 results in duplicate initial and final nodes
-        issues = protocol.is_well_formed()
-        if len(issues) > 0:
-            self.report_well_formedness_issues(issues)
+        if validate:
+            self.validate_protocol(protocol)
 
-        self.initialize(
-            protocol,
-            agent,
-            id,
-            parameter_values=parameter_values,
-            overwrite_execution=overwrite_execution,
-        )
+        # References are resolved through the document many times per step, so cache their resolution
+        with cached_lookups(protocol.document):
+            try:
+                self.initialize(
+                    protocol,
+                    agent,
+                    id,
+                    parameter_values=parameter_values,
+                    overwrite_execution=overwrite_execution,
+                )
 
-        if execution_context is None:
-            execution_context = ExecutionContext(self.ex, protocol, parameter_values)
+                if execution_context is None:
+                    execution_context = ExecutionContext(
+                        self.ex, protocol, parameter_values
+                    )
 
-        self.run(execution_context, start_time=start_time)
-        self.finalize(protocol, execution_context)
+                self.run(execution_context, start_time=start_time)
+                self.finalize(protocol, execution_context)
+            finally:
+                self.restore_serialization_format()
 
         return self.ex
 
+    def execute_many(
+        self,
+        protocol: Protocol,
+        agent: sbol3.Agent,
+        parameter_sets: List[List[ParameterValue]],
+        ids: Optional[List[str]] = None,
+        start_time: datetime.datetime = None,
+    ) -> List[ProtocolExecution]:
+        """Execute the given protocol once for each list of parameter values.
+        The protocol is validated once, rather than once per execution.
+        Timing for the batch is stored in self.batch_timing.
+
+        Parameters
+        ----------
+        protocol: Protocol to execute
+        agent: Agent that is executing this protocol
+        parameter_sets: List of the input parameter values for each execution
+        ids: display_id or URI to be used as the name of each execution; defaults to UUID display_ids
+        start_time: Start time for each execution
+
+        Returns
+        -------
+        List of ProtocolExecution, one for each list of parameter values
+        """
+        if ids is None:
+            ids = [new_uuid() for _ in parameter_sets]
+        if len(ids) != len(parameter_sets):
+            raise ValueError(
+                f"Expected {len(parameter_sets)} execution ids, but got {len(ids)}"
+            )
+
+        batch_start = time.perf_counter()
+        self.validate_protocol(protocol)
+        validation_time = time.perf_counter() - batch_start
+
+        executions = []
+        execution_times = []
+        for id, parameter_values in zip(ids, parameter_sets):
+            execution_start = time.perf_counter()
+            executions.append(
+                self.execute(
+                    protocol,
+                    agent,
+                    parameter_values=parameter_values,
+                    id=id,
+                    start_time=start_time,
+                    validate=False,
+                )
+            )
+            execution_times.append(time.perf_counter() - execution_start)
+
+        self.batch_timing = {
+            "executions": len(executions),
+            "validation": validation_time,
+            "execution": sum(execution_times),
+            "mean_execution": (
+                sum(execution_times) / len(execution_times) if execution_times else 0.0
+            ),
+            "max_execution": max(execution_times, default=0.0),
+            "total": time.perf_counter() - batch_start,
+        }
+        l.info(f"execute_many timing: {self.batch_timing}")
+        return executions
+
+    def validate_protocol(self, protocol: Protocol):
+        """Prepare the protocol for execution and report its well formedness issues
+
+        Parameters
+        ----------
+        protocol: Protocol to validate
+        """
+        if self.remove_duplicates:
+            protocol.remove_duplicates()  # FIXME needed because reading nt files with sbol3 results in duplicate initial and final nodes
+        issues = protocol.is_well_formed(cache_dir=self.well_formedness_cache_dir)
+        if len(issues) > 0:
+            self.report_well_formedness_issues(issues)
+
     def report_well_formedness_issues(self, issues: List[WellFormednessIssue]):
         infos = [issue for issue in issues if issue.level == WellformednessLevels.INFO]
         warnings = [
@@ -345,6 +486,18 @@ class ExecutionEngine(ABC):
     ):
         new_execution_contexts = []
         new_tokens = {}
+
+        def add_tokens(tokens_created, new_execution_context):
+            # new_execution_context will have tokens and ready nodes initialized
+            if (new_execution_context is not None) and not (
+                new_execution_context in active_contexts
+            ):
+                new_execution_contexts.append(new_execution_context)
+                new_tokens[new_execution_context] = []
+
+            for ec1, tokens in tokens_created.items():
+                new_tokens[ec1] += tokens
+
         for ec in active_contexts:
             new_tokens[ec] = [] if ec not in new_tokens else new_tokens[ec]
             non_call_nodes = [
@@ -352,38 +505,53 @@ class ExecutionEngine(ABC):
             ]
 
             # prefer executing non_call_nodes first
-            for node in non_call_nodes + [
-                n for n in ec.ready if n not in non_call_nodes
-            ]:
-                self.current_node = node
-                try:
-                    (
-                        tokens_created,
-                        tokens_consumed,
-                        new_execution_context,
-                    ) = self.execute_node(ec, node, node_outputs)
-
-                    ec.tokens = [t for t in ec.tokens if t not in tokens_consumed[ec]]
-
-                    # new_execution_context will have tokens and ready nodes initialized
-                    if (new_execution_context is not None) and not (
-                        new_execution_context in active_contexts
+            # When running in parallel, consecutive parallelizable nodes are prepared (in order), their outputs
+            # are computed concurrently, and then they are committed in the same order as a serial execution.
+            prepared = []
+            for node in (
+                non_call_nodes
+                + [n for n in ec.ready if n not in non_call_nodes]
+                + [None]
+            ):
+                if (
+                    node is not None
+                    and self.parallel
+                    and self.is_parallelizable(node, node_outputs)
+                ):
+                    self.current_node = node
+                    with self.handle_issues():
+                        record, tokens_consumed = self.prepare_node(ec, node)
+                        prepared.append((node, record, tokens_consumed))
+                    continue
+
+                if len(prepared) > 0:
+                    with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                        futures = [
+                            pool.submit(self.next_tokens, ec, record, node_outputs)
+                            for _, record, _ in prepared
+                        ]
+                    for (p_node, record, tokens_consumed), future in zip(
+                        prepared, futures
                     ):
-                        new_execution_contexts.append(new_execution_context)
-                        new_tokens[new_execution_context] = []
-
-                    for ec1, tokens in tokens_created.items():
-                        new_tokens[ec1] += tokens
-
-                except Exception as e:
-                    if self.permissive:
-                        self.issues[self.ex.display_id].append(ExecutionWarning(e))
-                    else:
-                        self.issues[self.ex.display_id].append(ExecutionError(e))
-                        raise (e)
+                        self.current_node = p_node
+                        with self.handle_issues():
+                            tokens_created, new_execution_context = self.commit_node(
+                                ec, record, future.result(), node_outputs
+                            )
+                            add_tokens(tokens_created, new_execution_context)
+                    prepared = []
+
+                if node is not None:
+                    self.current_node = node
+                    with self.handle_issues():
+                        (
+                            tokens_created,
+                            tokens_consumed,
+                            new_execution_context,
+                        ) = self.execute_node(ec, node, node_outputs)
+                        add_tokens(tokens_created, new_execution_context)
         active_contexts += new_execution_contexts
         for ec in active_contexts:
-            ec.tokens += new_tokens[ec]
             ec.ready = self.executable_activity_nodes(ec, new_tokens[ec])
 
         return (
@@ -400,6 +568,79 @@ class ExecutionEngine(ABC):
         Dict[ExecutionContext, List[ActivityEdgeFlow]],
         ExecutionContext,
     ]:
+        record, tokens_consumed = self.prepare_node(execution_context, node)
+
+        # from ActivityNode.execute()
+        tokens_created: Dict[
+            ExecutionContext, List[ActivityEdgeFlow]
+        ] = self.next_tokens(execution_context, record, node_outputs)
+
+        tokens_created, new_execution_context = self.commit_node(
+            execution_context, record, tokens_created, node_outputs
+        )
+        return tokens_created, tokens_consumed, new_execution_context
+
+    @contextmanager
+    def handle_issues(self):
+        """Record an exception raised while executing self.current_node as an issue, and only re-raise it if not permissive"""
+        try:
+            yield
+        except Exception as e:
+            if self.permissive:
+                self.issues[self.ex.display_id].append(ExecutionWarning(e))
+            else:
+                self.issues[self.ex.display_id].append(ExecutionError(e))
+                raise (e)
+
+    def is_parallelizable(
+        self,
+        node: ActivityNode,
+        node_outputs: Dict[ActivityNode, Callable] = {},
+    ) -> bool:
+        """Check whether the output tokens of node can be computed concurrently with other ready nodes.
+        Only primitives with a dedicated compute_output function qualify, because the default Primitive.compute_output
+        adds objects to the document and subprotocol invocations create new ExecutionContexts.
+        The records of all nodes computed together are created before any of them are committed, so the
+        specializations must also only read the record of node, as they would see the later records.
+
+        Parameters
+        ----------
+        node: ready node
+        node_outputs: user supplied functions that compute node outputs
+
+        Returns
+        -------
+        bool if node can be executed in parallel
+        """
+        if node_outputs or not isinstance(node, CallBehaviorAction):
+            return False
+        behavior = node.get_behavior()
+        return (
+            isinstance(behavior, Primitive)
+            and hasattr(behavior.compute_output, "__func__")
+            and behavior.compute_output.__func__ != Primitive.compute_output
+            and all(
+                specialization.processes_record_only(behavior.identity)
+                for specialization in self.specializations
+            )
+        )
+
+    def prepare_node(
+        self,
+        execution_context: ExecutionContext,
+        node: ActivityNode,
+    ) -> Tuple[ActivityNodeExecution, Dict[ExecutionContext, List[ActivityEdgeFlow]]]:
+        """Consume the tokens supporting node and record its execution
+
+        Parameters
+        ----------
+        execution_context: context of node
+        node: node to execute
+
+        Returns
+        -------
+        The execution record and the consumed tokens
+        """
         # Process inputs
         supporting_tokens: Dict[
             ActivityEdge, List[ActivityEdgeFlow]
@@ -412,12 +653,29 @@ class ExecutionEngine(ABC):
         # Create execution record
         record = self.create_record(node, tokens_consumed[execution_context])
         self.ex.executions.append(record)
+        return record, tokens_consumed
 
-        # from ActivityNode.execute()
-        tokens_created: Dict[
-            ExecutionContext, List[ActivityEdgeFlow]
-        ] = self.next_tokens(execution_context, record, node_outputs)
+    def commit_node(
+        self,
+        execution_context: ExecutionContext,
+        record: ActivityNodeExecution,
+        tokens_created: Dict[ExecutionContext, List[ActivityEdgeFlow]],
+        node_outputs: Dict[ActivityNode, Callable] = {},
+    ) -> Tuple[Dict[ExecutionContext, List[ActivityEdgeFlow]], ExecutionContext]:
+        """Add the tokens created by the execution record to the execution trace and process the record
+
+        Parameters
+        ----------
+        execution_context: context of the executed node
+        record: execution record created by prepare_node()
+        tokens_created: tokens computed by next_tokens()
+        node_outputs: user supplied functions that compute node outputs
 
+        Returns
+        -------
+        The created tokens and the new ExecutionContext, if any
+        """
+        node = record.get_node()
         for _, created in tokens_created.items():
             self.ex.flows += created
 
@@ -443,7 +701,7 @@ class ExecutionEngine(ABC):
         else:
             new_execution_context = None
 
-        return tokens_created, tokens_consumed, new_execution_context
+        return tokens_created, new_execution_context
 
     def next_tokens(
         self,
@@ -464,7 +722,7 @@ class ExecutionEngine(ABC):
         outgoing_edges = execution_context.outgoing_edges(node)
         outgoing_edges.sort(key=lambda x: x.identity)
         parameter_value_map = record.parameter_value_map()
-        invocation_hash = hash(record)
+        invocation_hash = record.invocation_hash()
         new_tokens: Dict[ExecutionContext, List[ActivityEdgeFlow]] = {
             execution_context: [
                 ActivityEdgeFlow(
@@ -646,14 +904,13 @@ class ExecutionEngine(ABC):
         node: ActivityNode,
         supporting_tokens: Dict[ActivityEdge, List[ActivityEdgeFlow]],
     ) -> Dict[ExecutionContext, List[ActivityEdgeFlow]]:
-        ec_consumed_tokens = []
+        # Check that every required edge has a token before consuming any of them
+        edges_with_tokens = []
         for edge, tokens in supporting_tokens.items():
-            source = edge.get_source()
-            target = edge.get_target()
-            try:
-                token = next(iter(tokens))
-                ec_consumed_tokens.append(token)
-            except StopIteration:
+            if len(tokens) > 0:
+                edges_with_tokens.append(edge)
+            else:
+                source = edge.get_source()
                 if source.required():
                     msg = f"Could not find a required token for source: {source.name}"
                     if self.permissive:
@@ -661,16 +918,11 @@ class ExecutionEngine(ABC):
                     else:
                         raise ExecutionError(msg)
 
-        consumed_tokens = {execution_context: ec_consumed_tokens}
         # Remove values on edges
-        execution_context.incoming_edge_tokens[node] = {
-            edge: [
-                v
-                for v in execution_context.incoming_edge_tokens[node][edge]
-                if v not in consumed_tokens[execution_context]
-            ]
-            for edge in execution_context.incoming_edge_tokens[node]
-        }
+        ec_consumed_tokens = [
+            execution_context.consume_token(node, edge) for edge in edges_with_tokens
+        ]
+        consumed_tokens = {execution_context: ec_consumed_tokens}
         return consumed_tokens
 
     def executable_activity_nodes(
@@ -687,19 +939,14 @@ class ExecutionEngine(ABC):
         List of ActivityNodes that are ready to be run
         """
         # candidate_clusters = {}
-        updated_clusters = set({})
+        updated_clusters = execution_context.produce_tokens(tokens_added)
         for t in tokens_added:
-            target = t.get_target()
-            execution_context.incoming_edge_tokens[target][t.get_edge()].append(t)
-            execution_context.candidate_clusters[
-                target.identity
-            ] = execution_context.candidate_clusters.get(target.identity, []) + [t]
-            updated_clusters.add(target)
+            execution_context.candidate_clusters.setdefault(
+                t.get_target().identity, []
+            ).append(t)
 
         enabled_nodes = [
-            n
-            for n in updated_clusters
-            if n.enabled(execution_context.incoming_edge_tokens[n], self)
+            n for n in updated_clusters if execution_context.is_ready(n, self)
         ]
 
         # clear candidate clusters for enabled nodes
@@ -749,7 +996,8 @@ class ExecutionEngine(ABC):
                 l.error(
                     f"Could Not Process {record.name if record.name else record.identity}: {e}"
                 )
-        if self.track_samples and isinstance(record.node.lookup(), CallBehaviorAction):
+        if self.track_samples:
+            # The observer skips nodes that it does not track
             self.prov_observer.update(record)
 
     def write_data_templates(
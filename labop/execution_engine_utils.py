@@ -1,4 +1,5 @@
 import logging
+from typing import Iterable, Iterator
 
 from labop import ActivityEdgeFlow
 from uml import CallBehaviorAction, Pin
@@ -25,6 +26,14 @@ class ProtocolExecutionExtractor:
     def extract_record(self, record: ActivityNodeExecution):
         pass
 
+    def extract_records(self, records: Iterable[ActivityNodeExecution]) -> Iterator:
+        """
+        Extract each of records as it is requested, so that long traces are
+        not held in memory.
+        """
+        for record in records:
+            yield self.extract_record(record)
+
     def extract_token(self, token: ActivityEdgeFlow):
         pass
 
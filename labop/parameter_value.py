@@ -7,7 +7,7 @@ from typing import Dict, List, Union
 import sbol3
 
 import labop.inner as inner
-from uml import LiteralSpecification, labop_hash
+from uml import LiteralSpecification
 
 
 class ParameterValue(inner.ParameterValue):
@@ -15,7 +15,7 @@ class ParameterValue(inner.ParameterValue):
         super().__init__(*args, **kwargs)
 
     def __hash__(self):
-        return labop_hash(self.identity)
+        return hash(self.identity)
 
     def get_parameter(self):
         return self.parameter.lookup().property_value
@@ -2,10 +2,13 @@
 The Protocol class defines the functions corresponding to the dynamically generated labop class Protocol
 """
 
+import json
 import logging
-from collections import Counter
-from typing import List, Tuple
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 
+import rdflib
 import sbol3
 
 import labop.inner as inner
@@ -23,7 +26,16 @@ from uml import (
     ObjectNode,
     ValueSpecification,
 )
-from uml.utils import WellFormednessError, WellFormednessIssue, WhereDefinedMixin
+from uml.utils import (
+    WellFormednessError,
+    WellFormednessInfo,
+    WellFormednessIssue,
+    WellformednessLevels,
+    WellFormednessWarning,
+    WhereDefinedMixin,
+    labop_hash,
+    object_state_hash,
+)
 
 from .library import import_library
 from .primitive import Primitive
@@ -32,6 +44,16 @@ from .utils.helpers import prepare_document
 logger = logging.getLogger(__file__)
 logger.setLevel(logging.INFO)
 
+# Well formedness reports keyed by Protocol.content_hash(), see Protocol.is_well_formed()
+WELL_FORMEDNESS_CACHE: "OrderedDict[str, List[Dict[str, str]]]" = OrderedDict()
+# Maximum number of reports kept in WELL_FORMEDNESS_CACHE, the least recently used are dropped
+WELL_FORMEDNESS_CACHE_SIZE = 128
+WELL_FORMEDNESS_ISSUE_TYPES = {
+    WellformednessLevels.ERROR: WellFormednessError,
+    WellformednessLevels.WARNING: WellFormednessWarning,
+    WellformednessLevels.INFO: WellFormednessInfo,
+}
+
 
 class Protocol(inner.Protocol, Activity):
     def __init__(self, *args, **kwargs):
@@ -167,9 +189,9 @@ class Protocol(inner.Protocol, Activity):
             )
             self.edges.append(decision_input_to_decision_flow)
 
-        primary_incoming_flow.target = decision
+        self.set_edge_endpoints(primary_incoming_flow, target=decision)
         if decision_input_flow:
-            decision_input_flow.target = decision
+            self.set_edge_endpoints(decision_input_flow, target=decision)
 
         # Make edges for outgoing_targets
         if outgoing_targets:
@@ -186,13 +208,126 @@ class Protocol(inner.Protocol, Activity):
         """
         return f'protocol = labop.Protocol(\n\t"Identity",\n\tname="Name",\n\tdescription="Description")'
 
-    def is_well_formed(self) -> List[WellFormednessIssue]:
+    def content_hash(self) -> str:
+        """
+        Compute a digest of the sorted triples of the protocol and of the behaviors that it calls (recursively).
+        The digest changes whenever a change to the protocol could change its well formedness.
+        It is only recomputed when the property values of the protocol or of the behaviors change.
+        :return: str
+        """
+        behaviors = []
+        found = set()
+        pending = [self]
+        while pending:
+            activity = pending.pop()
+            if activity.identity in found:
+                continue
+            found.add(activity.identity)
+            behaviors.append(activity)
+            for node in activity.nodes:
+                behavior = node.behavior.lookup() if hasattr(node, "behavior") else None
+                if behavior is None or behavior.identity in found:
+                    continue
+                if isinstance(behavior, Activity):
+                    pending.append(behavior)
+                else:
+                    found.add(behavior.identity)
+                    behaviors.append(behavior)
+
+        state = hash(tuple(object_state_hash(behavior) for behavior in behaviors))
+        cached = getattr(self, "_content_hash", None)
+        if cached is not None and cached[0] == state:
+            return cached[1]
+
+        graph = rdflib.Graph()
+        for behavior in behaviors:
+            behavior.serialize(graph)
+        triples = sorted(" ".join(term.n3() for term in triple) for triple in graph)
+        digest = f"{labop_hash(triples):032x}"
+        self._content_hash = (state, digest)
+        return digest
+
+    def is_well_formed(
+        self, cache_dir: Optional[str] = None
+    ) -> List[WellFormednessIssue]:
         """
         A protocol is well formed if:
         - each ActivityNode is well formed
         - each ActivityEdge is well formed
         - has an initial node
         - has a final node
+
+        The report is cached by content_hash(), so an unchanged protocol is only checked once.
+        A cached report that refers to objects that are not in the document is not used.
+        :param cache_dir: directory where reports are also stored, so that they persist between sessions
+        :return: List of WellFormednessIssue
+        """
+        key = self.content_hash()
+        cache_file = (
+            os.path.join(cache_dir, f"well_formedness_{key}.json")
+            if cache_dir
+            else None
+        )
+        report = WELL_FORMEDNESS_CACHE.get(key)
+        if report is None and cache_file and os.path.exists(cache_file):
+            with open(cache_file) as f:
+                report = json.load(f)
+        if report is not None:
+            issues = self.issues_from_report(report)
+            if issues is not None:
+                self.cache_well_formedness_report(key, report)
+                return issues
+
+        issues = self.check_well_formed()
+
+        report = [
+            {
+                "object": issue.object.identity,
+                "level": issue.level,
+                "description": issue.description,
+                "suggestion": issue.suggestion,
+            }
+            for issue in issues
+        ]
+        self.cache_well_formedness_report(key, report)
+        if cache_file:
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(cache_file, "w") as f:
+                json.dump(report, f)
+        return issues
+
+    def issues_from_report(
+        self, report: List[Dict[str, str]]
+    ) -> Optional[List[WellFormednessIssue]]:
+        """
+        Get the issues of a cached well formedness report, or None if any of
+        the objects of the report are not in the document.
+        :param report: issues, as cached by is_well_formed()
+        :return: List of WellFormednessIssue, or None
+        """
+        issues = []
+        for issue in report:
+            obj = self.document.find(issue["object"])
+            if obj is None:
+                return None
+            issues.append(
+                WELL_FORMEDNESS_ISSUE_TYPES[issue["level"]](
+                    obj, issue["description"], issue["suggestion"]
+                )
+            )
+        return issues
+
+    @staticmethod
+    def cache_well_formedness_report(key: str, report: List[Dict[str, str]]):
+        WELL_FORMEDNESS_CACHE[key] = report
+        WELL_FORMEDNESS_CACHE.move_to_end(key)
+        while len(WELL_FORMEDNESS_CACHE) > WELL_FORMEDNESS_CACHE_SIZE:
+            WELL_FORMEDNESS_CACHE.popitem(last=False)
+
+    def check_well_formed(self) -> List[WellFormednessIssue]:
+        """
+        Check the protocol, bypassing the cache used by is_well_formed()
+        :return: List of WellFormednessIssue
         """
         issues = []
 
@@ -237,19 +372,26 @@ class Protocol(inner.Protocol, Activity):
         """
         Remove duplicate nodes, preferring to remove those without edges
         """
+        nodes_by_identity = {}
+        for n in self.nodes:
+            nodes_by_identity.setdefault(n.identity, []).append(n)
         duplicates = {
-            n.identity: set({n1 for n1 in self.nodes if n1.identity == n.identity})
-            for n in self.nodes
+            identity: dup for identity, dup in nodes_by_identity.items() if len(dup) > 1
         }
-        for id, dup in duplicates.items():
-            if len(dup) > 1:
-                # Remove nodes that are not connected by an edge
-                targets = Counter(
-                    e.get_target() for e in self.edges if e.get_target() in dup
-                )
-                sources = Counter(
-                    e.get_source() for e in self.edges if e.get_source() in dup
-                )
-                dups_to_remove = [d for d in dup if targets[d] == 0 and sources[d] == 0]
-                for n in dups_to_remove:
-                    del self.nodes[self.nodes.index(n)]
+        if len(duplicates) == 0:
+            return
+
+        # Edges refer to a node by identity, so the connected duplicate is the one that the edge endpoints resolve to
+        connected = set()
+        for e in self.edges:
+            for endpoint in [e.source, e.target]:
+                if str(endpoint) in duplicates:
+                    connected.add(id(endpoint.lookup()))
+
+        # Remove nodes that are not connected by an edge
+        dups_to_remove = {
+            id(d) for dup in duplicates.values() for d in dup if id(d) not in connected
+        }
+        for i in reversed(range(len(self.nodes))):
+            if id(self.nodes[i]) in dups_to_remove:
+                del self.nodes[i]
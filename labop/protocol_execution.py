@@ -4,7 +4,7 @@ The ProtocolExecution class defines the functions corresponding to the dynamical
 
 import datetime
 import json
-from typing import List
+from typing import Dict, List, Optional, TextIO
 
 import graphviz
 import sbol3
@@ -43,6 +43,35 @@ class ProtocolExecution(inner.ProtocolExecution, BehaviorExecution):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
+    def token_consumers(self) -> Dict[str, "ActivityNodeExecution"]:
+        """
+        Index the executions by the token sources of their incoming flows.
+
+        Returns
+        -------
+        Dict[str, ActivityNodeExecution]
+            first execution (in the order of self.executions) that consumed a
+            token from each token source, by the identity of the token source.
+            The index is cached until the executions change.
+        """
+        # Specializations order the executions on every render, so keep the index
+        key = tuple(execution.identity for execution in self.executions)
+        cache = getattr(self, "_token_consumers", None)
+        if cache is not None and cache[0] == key:
+            return dict(cache[1])
+
+        # Look up flows in self.flows rather than searching the document for each flow
+        flows = {flow.identity: flow for flow in self.flows}
+        consumers = {}
+        for execution in self.executions:
+            for flow_uri in execution.incoming_flows:
+                flow = flows.get(str(flow_uri))
+                if flow is None:
+                    flow = flow_uri.lookup()
+                consumers.setdefault(str(flow.token_source), execution)
+        self._token_consumers = (key, consumers)
+        return dict(consumers)
+
     def get_ordered_executions(self):
         protocol = self.protocol.lookup()
         try:
@@ -52,25 +81,16 @@ class ProtocolExecution(inner.ProtocolExecution, BehaviorExecution):
         execution_start_node = next(
             x for x in self.executions if x.node == start_node.identity
         )  # ActivityNodeExecution
+        consumers = self.token_consumers()
         ordered_execution_nodes = []
         current_execution_node = execution_start_node
         while current_execution_node:
-            try:
-                current_execution_node = next(
-                    x
-                    for x in self.executions
-                    for f in x.incoming_flows
-                    if f.lookup().token_source == current_execution_node.identity
-                )
+            current_execution_node = consumers.get(current_execution_node.identity)
+            if current_execution_node is not None:
                 ordered_execution_nodes.append(current_execution_node)
-            except ValueError:
-                current_execution_node = None
-            except StopIteration:
-                current_execution_node = None
         return ordered_execution_nodes
 
     def get_subprotocol_executions(self):
-        ordered_subprotocol_executions = []
         ordered_execution_nodes = self.get_ordered_executions()
         ordered_behavior_nodes = [
             x.node.lookup().behavior.lookup()
@@ -80,11 +100,12 @@ class ProtocolExecution(inner.ProtocolExecution, BehaviorExecution):
         ordered_subprotocols = [
             x.identity for x in ordered_behavior_nodes if isinstance(x, Protocol)
         ]
+        protocol_executions = {}
+        for o in self.document.objects:
+            if type(o) is ProtocolExecution:
+                protocol_executions.setdefault(str(o.protocol), []).append(o)
         ordered_subprotocol_executions = [
-            o
-            for x in ordered_subprotocols
-            for o in self.document.objects
-            if type(o) is ProtocolExecution and o.protocol == x
+            o for x in ordered_subprotocols for o in protocol_executions.get(x, [])
         ]
         return ordered_subprotocol_executions
 
@@ -347,48 +368,96 @@ class ProtocolExecution(inner.ProtocolExecution, BehaviorExecution):
         stack=None,
         extractor: ProtocolExecutionExtractor = JSONProtocolExecutionExtractor(),
     ):
+        """
+        Get the nodes executed by the records in stack (default:
+        self.executions), and the records extracted by extractor.
+        """
         stack = self.executions if stack is None else stack
-        if len(stack) == 0:
-            return set([]), []
-        else:
-            tail = stack[-1]
-            head = stack[:-1]
-            nodes, head = self.backtrace(stack=head)
-            nodes.add(tail.node.lookup())
-            head += [extractor.extract_record(tail)]
-            return nodes, head
-
-    def to_json(self):
+        nodes = {}
+        for record in stack:
+            if str(record.node) not in nodes:
+                nodes[str(record.node)] = record.node.lookup()
+        return set(nodes.values()), list(extractor.extract_records(stack))
+
+    def to_json(self, stream: Optional[TextIO] = None):
         """
         Convert Protocol Execution to JSON
+
+        Parameters
+        ----------
+        stream : Optional[TextIO]
+            write the JSON to stream one record at a time, rather than
+            returning it
+
+        Returns
+        -------
+        Optional[str]
+            JSON, if no stream is given
+        """
+        records = JSONProtocolExecutionExtractor().extract_records(self.executions)
+        if stream is None:
+            return json.dumps(list(records))
+        stream.write("[")
+        for i, record in enumerate(records):
+            if i > 0:
+                stream.write(", ")
+            stream.write(json.dumps(record))
+        stream.write("]")
+
+    def unbound_parameters(self, direction: str) -> List[uml.Parameter]:
         """
-        p_json = self.backtrace(extractor=JSONProtocolExecutionExtractor())[1]
-        return json.dumps(p_json)
+        Parameters of the ActivityParameterNodes executed by this execution
+        with direction, that are not bound by self.parameter_values (one per
+        execution of the node).  The result is cached until the executions or
+        parameter values change.
 
-    def unbound_inputs(self):
-        unbound_input_parameters = [
-            p.node.lookup().parameter.lookup().property_value
-            for p in self.executions
-            if isinstance(p.node.lookup(), ActivityParameterNode)
-            and p.node.lookup().parameter.lookup().property_value.direction
-            == PARAMETER_IN
-            and p.node.lookup().parameter.lookup().property_value
-            not in [
-                pv.parameter.lookup().property_value for pv in self.parameter_values
-            ]
+        Parameters
+        ----------
+        direction : str
+            PARAMETER_IN or PARAMETER_OUT
+
+        Returns
+        -------
+        List[uml.Parameter]
+            unbound parameters
+        """
+        # The result depends on the executed nodes and the bound parameters
+        key = (
+            tuple(str(e.node) for e in self.executions),
+            tuple(str(pv.parameter) for pv in self.parameter_values),
+        )
+        cache = getattr(self, "_unbound_parameters", None)
+        if cache is None:
+            cache = self._unbound_parameters = {}
+        if direction in cache and cache[direction][0] == key:
+            return list(cache[direction][1])
+
+        bound = {
+            pv.parameter.lookup().property_value.identity
+            for pv in self.parameter_values
+        }
+        # Parameter of each executed node, or None if it is not an ActivityParameterNode
+        node_parameters = {}
+        for execution in self.executions:
+            if str(execution.node) not in node_parameters:
+                node = execution.node.lookup()
+                node_parameters[str(execution.node)] = (
+                    node.parameter.lookup().property_value
+                    if isinstance(node, ActivityParameterNode)
+                    else None
+                )
+        unbound = [
+            parameter
+            for parameter in (node_parameters[str(e.node)] for e in self.executions)
+            if parameter is not None
+            and parameter.direction == direction
+            and parameter.identity not in bound
         ]
-        return unbound_input_parameters
+        cache[direction] = (key, unbound)
+        return list(unbound)
+
+    def unbound_inputs(self):
+        return self.unbound_parameters(PARAMETER_IN)
 
     def unbound_outputs(self):
-        unbound_output_parameters = [
-            p.node.lookup().parameter.lookup().property_value
-            for p in self.executions
-            if isinstance(p.node.lookup(), ActivityParameterNode)
-            and p.node.lookup().parameter.lookup().property_value.direction
-            == PARAMETER_OUT
-            and p.node.lookup().parameter.lookup().property_value
-            not in [
-                pv.parameter.lookup().property_value for pv in self.parameter_values
-            ]
-        ]
-        return unbound_output_parameters
+        return self.unbound_parameters(PARAMETER_OUT)
@@ -6,6 +6,7 @@ import json
 import logging
 import os
 
+import numpy as np
 import xarray as xr
 
 import labop.inner as inner
@@ -24,6 +25,8 @@ l.setLevel(logging.INFO)
 class SampleArray(inner.SampleArray, SampleCollection):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # Number used in the next sample id, see new_sample_ids()
+        self.sample_counter = 0
 
     def get_sample_names(self):
         sample_dict = json.loads(self.initial_contents)
@@ -40,16 +43,31 @@ class SampleArray(inner.SampleArray, SampleCollection):
         )
 
     def new_sample_id(self) -> str:
-        if not hasattr(self, "sample_counter"):
-            self.sample_counter = 0
+        return str(self.new_sample_ids(1)[0])
 
-        id = self.sample_counter
-        self.sample_counter += 1
-        return f"{Strings.SAMPLE}_{self.name}_{id}"
+    def new_sample_ids(self, n: int) -> np.ndarray:
+        """
+        Allocate n consecutive sample ids.
+
+        Parameters
+        ----------
+        n : int
+            number of sample ids
+
+        Returns
+        -------
+        np.ndarray
+            string array of the sample ids
+        """
+        start = self.sample_counter
+        self.sample_counter += n
+        return np.char.add(
+            f"{Strings.SAMPLE}_{self.name}_", np.arange(start, start + n).astype(str)
+        )
 
     def empty(self, geometry=None, sample_format=Strings.XARRAY):
         locations = get_sample_list(geometry) if geometry else []
-        samples = [self.new_sample_id() for l in locations]
+        samples = self.new_sample_ids(len(locations))
 
         if sample_format == Strings.XARRAY:
             sample_array = xr.Dataset(
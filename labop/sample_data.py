@@ -10,7 +10,12 @@ import xarray as xr
 from numpy import nan
 
 import labop.inner as inner
-from labop.data import deserialize_sample_format, serialize_sample_format
+from labop.data import (
+    deserialize_sample_format,
+    document_index,
+    humanize_values,
+    serialize_sample_format,
+)
 from labop.strings import Strings
 
 
@@ -131,26 +136,22 @@ class SampleData(inner.SampleData):
         # rename all values of variables to human readible values
         sample_array = self.to_data_array(sample_format=sample_format)
         if sample_format == Strings.XARRAY:
+            index = document_index(self.document)
             var = sample_array.name
-            var_obj = self.document.find(var)
-            if var_obj is not None:
-                sample_array.name = str(var_obj.name)
+            if isinstance(var, str) and var in index:
+                sample_array.name = str(index[var].name)
 
             # humanize the data
-            if sample_array.dtype.str == "<U102" or sample_array.dtype.str == "|O":
-                unique_values = set(sample_array.data.tolist())
-                for old in unique_values:
-                    val_obj = self.document.find(old)
-                    if val_obj is not None:
-                        new = str(val_obj)
-                        sample_array = sample_array.str.replace(old, str(new))
-                for c in sample_array.coords:
-                    unique_values = set(sample_array[c].data.tolist())
-                    for old in unique_values:
-                        val_obj = self.document.find(old)
-                        if val_obj is not None:
-                            new = str(val_obj)
-                            sample_array[c] = sample_array[c].str.replace(old, str(new))
+            if sample_array.dtype.kind in "OUS":
+                values = humanize_values(sample_array.data, index)
+                if values is not None:
+                    sample_array = sample_array.copy(data=values)
+                for c in list(sample_array.coords):
+                    values = humanize_values(sample_array[c].data, index)
+                    if values is not None:
+                        sample_array = sample_array.assign_coords(
+                            {c: sample_array[c].copy(data=values)}
+                        )
             return sample_array
         else:
             return sample_array
@@ -4,6 +4,7 @@ The SampleMask class defines the functions corresponding to the dynamically gene
 
 import json
 
+import numpy as np
 import xarray as xr
 
 import labop.inner as inner
@@ -23,6 +24,9 @@ class SampleMask(inner.SampleMask, SampleCollection):
     def new_sample_id(self) -> str:
         return self.source.lookup().new_sample_id()
 
+    def new_sample_ids(self, n: int) -> np.ndarray:
+        return self.source.lookup().new_sample_ids(n)
+
     def empty(self, sample_format=Strings.XARRAY):
         if sample_format == "xarray":
             source_samples = self.get_source()
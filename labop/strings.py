@@ -5,6 +5,7 @@ class Strings:
     DATA = "data"
     XARRAY = "xarray"
     JSON = "json"
+    NPZ = "npz"
     MASK = "mask"
     MEASUREMENT = "measurement"
     CONTENTS = "contents"
@@ -18,6 +19,7 @@ class Strings:
     TARGET_LOCATION = "target_location"
     SAMPLE_LOCATION = "sample_location"
     NEXT_SAMPLE_LOCATION = "next_sample_location"
+    TRANSFER = "transfer"
     CONCENTRATION = "concentration"
     REAGENT = "reagent"
     EDGE = "edge"
@@ -2,8 +2,10 @@
 Generic helper functions for dealing with plate coordinates
 """
 
+import functools
 import re
 from string import ascii_letters
+from typing import Tuple
 
 import numpy as np
 
@@ -125,6 +127,30 @@ def coordinate_to_row_col(coord: str):
     return (row2num(m.group(1)) - 1), (int(m.group(2)) - 1)
 
 
+@functools.lru_cache(maxsize=128)
+def coordinates_to_row_col_arrays(coords: Tuple[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert coordinates, e.g., ("A1", "A2", "B1"), into parallel arrays of zero-based row and column indices, e.g.,
+    ([0, 0, 1], [0, 1, 0]).  The arrays are cached for each tuple of coordinates, and are read-only.
+
+    Parameters
+    ----------
+    coords : Tuple[str]
+        Humanized coordinates
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        row indices and column indices
+    """
+    pairs = [coordinate_to_row_col(coord) for coord in coords]
+    rows = np.array([row for row, _ in pairs], dtype=int)
+    cols = np.array([col for _, col in pairs], dtype=int)
+    rows.setflags(write=False)
+    cols.setflags(write=False)
+    return rows, cols
+
+
 def coordinate_rect_to_row_col_pairs(coords: str) -> list:
     num_separators = coords.count(":")
     if num_separators == 0:
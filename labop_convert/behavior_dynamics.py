@@ -1,11 +1,15 @@
 # Core packages
+import json
 import logging
 import os
 from abc import abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
 from random import sample
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
 import graphviz
 import numpy as np
+import pandas as pd
 
 # 3rd party packages
 import xarray as xr
@@ -13,6 +17,8 @@ from numpy import nan
 from pint import UnitRegistry
 from sbol3 import Measure
 from tyto import OM
+from xarray.backends import BackendArray
+from xarray.core import indexing
 
 # Project packages
 import uml
@@ -21,6 +27,650 @@ from labop.data import deserialize_sample_format, serialize_sample_format
 from labop.strings import Strings
 
 
+class NullableStringArray(BackendArray):
+    """
+    Lazily indexed object array of strings and nulls, read from a fixed-width
+    str array and a null mask, which may both be memory-mapped.
+    """
+
+    def __init__(self, values: np.ndarray, null: np.ndarray) -> None:
+        self.values = values
+        self.null = null
+        self.shape = values.shape
+        self.dtype = np.dtype(object)
+
+    def __getitem__(self, key):
+        return indexing.explicit_indexing_adapter(
+            key, self.shape, indexing.IndexingSupport.BASIC, self._getitem
+        )
+
+    def _getitem(self, key) -> np.ndarray:
+        values = np.asarray(self.values[key]).astype(object)
+        values[np.asarray(self.null[key])] = nan
+        return values
+
+
+class ProvenanceGraphStore:
+    """
+    Append-only storage for the sample provenance graph.
+
+    Each graph addition is kept as a block of nodes, and its edges are appended
+    to a growable edge table.  The xr.Dataset form of the graph is only built
+    when requested by to_dataset(), and only the blocks appended since the
+    previous request are merged into it.
+
+    If a directory is given, each addition is instead written to it as it is
+    appended, and read back lazily: the variables and edges of each block are
+    .npy files that are memory-mapped, with strings stored as fixed-width str
+    arrays, and the manifest lists the complete blocks.  The merged graph is
+    not kept in memory, and a store created on a directory that already has a
+    manifest continues it, so the graph of an interrupted execution can be
+    reloaded with load() and extended.
+    """
+
+    MANIFEST = "manifest.jsonl"
+    EDGES_FILE = "edges.npy"
+
+    def __init__(
+        self,
+        edge_capacity: int = 1024,
+        directory: Optional[str] = None,
+        resume: bool = True,
+    ) -> None:
+        self.node_blocks: List[xr.Dataset] = []
+        # exec_tick of the step that made each node block, if known
+        self.block_ticks: List[Optional[int]] = []
+        # Columns of the edge table are the coordinates of the "node" dimension
+        self.edge_columns: List[str] = [
+            Strings.SAMPLE_LOCATION,
+            Strings.NEXT_SAMPLE_LOCATION,
+        ]
+        # Edges are kept in the edge table, or in edge_blocks if they are written to directory
+        self.edge_table = (
+            np.full((edge_capacity, len(self.edge_columns)), nan, dtype=object)
+            if directory is None
+            else None
+        )
+        self.edge_blocks: List[xr.Variable] = []
+        self.n_edges = 0
+        # Offset of the first edge appended with each node block, and the number of edge columns after it
+        self.edge_offsets: List[int] = []
+        self.n_edge_columns: List[int] = []
+
+        self._nodes = None  # Merge of the first _n_merged node blocks
+        self._n_merged = 0
+        self._dataset = None
+
+        # Index coordinates of the graph, merged like the node blocks but without data
+        self._coordinates = None
+        self._n_coordinates = 0
+        # Latest (node block, tick) with a sample for each (container, location)
+        self.current_samples: Dict[Tuple[str, str], Tuple[int, int]] = {}
+
+        # Samples that each sample was made from, and vice versa, for the edges of the first _n_indexed blocks
+        self.predecessors: Dict[str, Set[str]] = {}
+        self.successors: Dict[str, Set[str]] = {}
+        self._n_indexed = 0
+
+        self.directory = directory
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            manifest = os.path.join(self.directory, self.MANIFEST)
+            if resume and os.path.exists(manifest):
+                self.resume()
+            else:
+                open(manifest, "w").close()
+
+    def __len__(self) -> int:
+        return len(self.node_blocks)
+
+    def append(self, graph_addition: xr.Dataset, tick: Optional[int] = None) -> None:
+        """
+        Add the nodes and edges of graph_addition to the graph.
+
+        Parameters
+        ----------
+        graph_addition : xr.Dataset
+            new samples, and the edges that lead to them
+        tick : Optional[int]
+            exec_tick of the step that made graph_addition
+        """
+        edges = None
+        if Strings.EDGES in graph_addition:
+            edges = graph_addition[Strings.EDGES]
+            graph_addition = graph_addition.drop_vars(Strings.EDGES)
+        self.append_block(graph_addition, edges=edges, tick=tick)
+
+    def append_block(
+        self,
+        block: xr.Dataset,
+        edges: Optional[xr.DataArray] = None,
+        tick: Optional[int] = None,
+    ) -> None:
+        self.edge_offsets.append(self.n_edges)
+        rows = self.append_edges(edges) if edges is not None else None
+        self.n_edge_columns.append(len(self.edge_columns))
+        self.block_ticks.append(tick)
+        if self.directory is not None:
+            if rows is None:
+                rows = np.empty((0, len(self.edge_columns)), dtype=object)
+            block, edge_block = self.write_block(len(self.node_blocks), block, rows)
+            self.edge_blocks.append(edge_block)
+        self.node_blocks.append(block)
+        self.update_current_samples(len(self.node_blocks) - 1)
+        self._dataset = None
+
+    def update_current_samples(self, block_index: int) -> None:
+        block = self.node_blocks[block_index]
+        if Strings.SAMPLE_LOCATION not in block or Strings.TICK not in block.dims:
+            return
+        sample_location = block.sample_location.transpose(
+            Strings.TICK, Strings.CONTAINER, Strings.LOCATION
+        )
+        containers = sample_location[Strings.CONTAINER].data
+        locations = sample_location[Strings.LOCATION].data
+        for i in np.argsort(sample_location[Strings.TICK].data, kind="stable"):
+            tick = int(sample_location[Strings.TICK].data[i])
+            for c, l in zip(*np.nonzero(~pd.isnull(sample_location.data[i]))):
+                well = (containers[c], locations[l])
+                if well not in self.current_samples or (
+                    self.current_samples[well][1] <= tick
+                ):
+                    self.current_samples[well] = (block_index, tick)
+
+    @staticmethod
+    def write_array(path: str, values: np.ndarray) -> Dict:
+        """
+        Write values to path, returning how they are encoded.  Object arrays of
+        strings and nulls are written as a fixed-width str array and a null
+        mask, so that they can be memory-mapped; other object arrays are
+        pickled.
+        """
+        encoding = "npy"
+        if values.dtype.kind == "O":
+            null = pd.isnull(values)
+            if all(isinstance(v, str) for v in values[~null].ravel()):
+                encoding = "str"
+                np.save(f"{path}.null.npy", null)
+                values = np.where(null, "", values).astype(str)
+            else:
+                encoding = "pickle"
+        np.save(path, values, allow_pickle=encoding == "pickle")
+        return {"encoding": encoding}
+
+    @staticmethod
+    def read_array(path: str, info: Dict):
+        """
+        Read an array written by write_array(), memory-mapped unless it was
+        pickled.
+        """
+        if info["encoding"] == "pickle":
+            return np.load(path, allow_pickle=True)
+        values = np.load(path, mmap_mode="r")
+        if info["encoding"] == "str":
+            null = np.load(f"{path}.null.npy", mmap_mode="r")
+            return indexing.LazilyIndexedArray(NullableStringArray(values, null))
+        return values
+
+    def write_block(
+        self, block_index: int, block: xr.Dataset, edges: np.ndarray
+    ) -> Tuple[xr.Dataset, xr.Variable]:
+        """
+        Write a node block and its edges to the directory, returning them read
+        back memory-mapped.
+        """
+        name = f"block_{block_index:06d}"
+        os.makedirs(os.path.join(self.directory, name), exist_ok=True)
+        variables = {}
+        for i, (key, variable) in enumerate(block.variables.items()):
+            path = os.path.join(self.directory, name, f"{i}.npy")
+            variables[str(key)] = {
+                "file": f"{i}.npy",
+                "dims": list(variable.dims),
+                "coord": key in block.coords,
+                "attrs": variable.attrs,
+                **self.write_array(path, variable.values),
+            }
+        edge_info = self.write_array(
+            os.path.join(self.directory, name, self.EDGES_FILE), edges
+        )
+
+        record = {
+            "block": name,
+            "tick": self.block_ticks[block_index],
+            "attrs": block.attrs,
+            "variables": variables,
+            "edge_columns": self.edge_columns[: edges.shape[1]],
+            "n_edges": len(edges),
+            "edges": edge_info,
+        }
+        # The manifest line is written last, so that it only lists complete blocks
+        with open(os.path.join(self.directory, self.MANIFEST), "a") as manifest:
+            manifest.write(json.dumps(record, default=str) + "\n")
+        return self.read_block(self.directory, record)
+
+    @classmethod
+    def read_block(cls, directory: str, record: Dict) -> Tuple[xr.Dataset, xr.Variable]:
+        data_vars = {}
+        coords = {}
+        for key, info in record["variables"].items():
+            path = os.path.join(directory, record["block"], info["file"])
+            variable = xr.Variable(
+                info["dims"], cls.read_array(path, info), attrs=info["attrs"]
+            )
+            (coords if info["coord"] else data_vars)[key] = variable
+        edges = xr.Variable(
+            (Strings.EDGE, Strings.NODE),
+            cls.read_array(
+                os.path.join(directory, record["block"], cls.EDGES_FILE),
+                record["edges"],
+            ),
+        )
+        block = xr.Dataset(data_vars, coords=coords, attrs=record["attrs"])
+        return block, edges
+
+    def resume(self) -> None:
+        """
+        Read the blocks listed in the manifest of the directory, so that new
+        blocks are appended after them.  The manifest is truncated after the
+        last complete block, such as when an execution was interrupted while
+        writing a block.
+        """
+        path = os.path.join(self.directory, self.MANIFEST)
+        records = []
+        complete = 0
+        with open(path, "rb") as manifest:
+            for line in manifest:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                if not line.endswith(b"\n") or not self.block_files_exist(
+                    record, len(records)
+                ):
+                    break
+                records.append(record)
+                complete += len(line)
+        with open(path, "r+b") as manifest:
+            manifest.truncate(complete)
+
+        for record in records:
+            block, edges = self.read_block(self.directory, record)
+            for column in record["edge_columns"]:
+                if column not in self.edge_columns:
+                    self.edge_columns.append(column)
+            self.edge_offsets.append(self.n_edges)
+            self.n_edges += record["n_edges"]
+            self.n_edge_columns.append(len(record["edge_columns"]))
+            self.block_ticks.append(record["tick"])
+            self.edge_blocks.append(edges)
+            self.node_blocks.append(block)
+            self.update_current_samples(len(self.node_blocks) - 1)
+
+    def block_files_exist(self, record: Dict, block_index: int) -> bool:
+        """
+        Check that a manifest record is for the block at block_index, and that
+        its files were written.
+        """
+        if record.get("block") != f"block_{block_index:06d}":
+            return False
+        files = [info["file"] for info in record["variables"].values()]
+        files += [self.EDGES_FILE]
+        return all(
+            os.path.exists(os.path.join(self.directory, record["block"], f))
+            for f in files
+        )
+
+    @classmethod
+    def load(cls, directory: str) -> "ProvenanceGraphStore":
+        """
+        Load the graph written to directory.  Additions appended to the loaded
+        store are also written to directory.
+
+        Parameters
+        ----------
+        directory : str
+            directory of a store that was created with the directory argument
+
+        Returns
+        -------
+        ProvenanceGraphStore
+            store with the blocks listed in the manifest
+        """
+        return cls(directory=directory)
+
+    def append_edges(self, edges: xr.DataArray) -> Optional[np.ndarray]:
+        """
+        Add edges to the graph, returning their rows in the order of the edge
+        columns.
+        """
+        if Strings.NODE not in edges.dims:
+            return None
+        edges = edges.transpose(..., Strings.NODE)
+        columns = [str(c) for c in edges[Strings.NODE].data]
+        for column in columns:
+            if column not in self.edge_columns:
+                self.edge_columns.append(column)
+                if self.edge_table is not None:
+                    self.edge_table = np.concatenate(
+                        [
+                            self.edge_table,
+                            np.full((len(self.edge_table), 1), nan, dtype=object),
+                        ],
+                        axis=1,
+                    )
+        data = edges.data.reshape(-1, len(columns))
+        rows = np.full((len(data), len(self.edge_columns)), nan, dtype=object)
+        rows[:, [self.edge_columns.index(c) for c in columns]] = data
+        n_rows = len(rows)
+        if self.edge_table is not None:
+            if self.n_edges + n_rows > len(self.edge_table):
+                capacity = max(2 * len(self.edge_table), self.n_edges + n_rows)
+                grown = np.full((capacity, len(self.edge_columns)), nan, dtype=object)
+                grown[: self.n_edges] = self.edge_table[: self.n_edges]
+                self.edge_table = grown
+            self.edge_table[self.n_edges : self.n_edges + n_rows] = rows
+        self.n_edges += n_rows
+        return rows
+
+    def block_edges(self, block_index: int, n_columns: int) -> np.ndarray:
+        """
+        Edges appended with a node block, as rows of the first n_columns edge
+        columns.
+        """
+        if self.edge_table is not None:
+            end = (
+                self.edge_offsets[block_index + 1]
+                if block_index + 1 < len(self.edge_offsets)
+                else self.n_edges
+            )
+            return self.edge_table[self.edge_offsets[block_index] : end, :n_columns]
+        rows = self.edge_blocks[block_index].values[:, :n_columns]
+        if rows.shape[1] < n_columns:
+            rows = np.concatenate(
+                [
+                    rows,
+                    np.full((len(rows), n_columns - rows.shape[1]), nan, dtype=object),
+                ],
+                axis=1,
+            )
+        return rows
+
+    @staticmethod
+    def merge_node_blocks(
+        blocks: List[xr.Dataset], nodes: Optional[xr.Dataset] = None
+    ) -> xr.Dataset:
+        nodes = nodes if nodes is not None else xr.Dataset()
+        if "tick" in nodes and all("tick" in block for block in blocks):
+            return xr.concat(blocks[::-1] + [nodes], dim="tick")
+        for block in blocks:
+            if "tick" in nodes and "tick" in block:
+                nodes = xr.concat([block, nodes], dim="tick")
+            else:
+                nodes = xr.merge([block, nodes])
+        return nodes
+
+    def nodes(self, n_blocks: Optional[int] = None) -> xr.Dataset:
+        """
+        Merge of the node blocks, with the most recent ticks first.
+
+        Parameters
+        ----------
+        n_blocks : Optional[int]
+            only merge the first n_blocks blocks (default: all blocks)
+        """
+        if n_blocks is not None and n_blocks < len(self.node_blocks):
+            return self.merge_node_blocks(self.node_blocks[:n_blocks])
+        if self.directory is not None:
+            # The merge is not kept, so that the graph is only in memory while it is used
+            return (
+                self.merge_node_blocks(self.node_blocks)
+                if self.node_blocks
+                else xr.Dataset()
+            )
+
+        pending = self.node_blocks[self._n_merged :]
+        if len(pending) > 0:
+            self._nodes = self.merge_node_blocks(pending, nodes=self._nodes)
+            self._n_merged = len(self.node_blocks)
+        return self._nodes if self._nodes is not None else xr.Dataset()
+
+    def edges(self, n_blocks: Optional[int] = None) -> xr.DataArray:
+        """
+        Edges of the graph, with the edges of the most recent additions first.
+        Edges missing a value in any column are omitted.
+
+        Parameters
+        ----------
+        n_blocks : Optional[int]
+            only include the edges of the first n_blocks blocks (default: all blocks)
+        """
+        if n_blocks is None or n_blocks > len(self.edge_offsets):
+            n_blocks = len(self.edge_offsets)
+        columns = (
+            self.edge_columns[: self.n_edge_columns[n_blocks - 1]]
+            if n_blocks > 0
+            else self.edge_columns[:2]
+        )
+        table = np.concatenate(
+            [self.block_edges(i, len(columns)) for i in reversed(range(n_blocks))]
+            + [np.empty((0, len(columns)), dtype=object)]
+        )
+        table = table[~pd.isnull(table).any(axis=1)]
+        return xr.DataArray(
+            table,
+            dims=(Strings.EDGE, Strings.NODE),
+            coords={Strings.NODE: columns},
+            name=Strings.EDGES,
+        )
+
+    def to_dataset(self, n_blocks: Optional[int] = None) -> xr.Dataset:
+        """
+        Materialize the graph as a Dataset with node variables and an "edges"
+        variable.
+
+        Parameters
+        ----------
+        n_blocks : Optional[int]
+            materialize the graph as it was after the first n_blocks additions
+            (default: all additions)
+        """
+        if n_blocks is not None and n_blocks < len(self.node_blocks):
+            if n_blocks == 0:
+                return xr.Dataset()
+            nodes = self.nodes(n_blocks=n_blocks)
+            if Strings.EDGES in nodes:
+                nodes = nodes.drop_vars(Strings.EDGES)
+            return xr.merge([nodes, self.edges(n_blocks=n_blocks)])
+
+        if self._dataset is None:
+            if len(self.node_blocks) == 0:
+                dataset = xr.Dataset()
+            else:
+                nodes = self.nodes()
+                if Strings.EDGES in nodes:
+                    nodes = nodes.drop_vars(Strings.EDGES)
+                dataset = xr.merge([nodes, self.edges()])
+            if self.directory is None:
+                self._dataset = dataset
+            return dataset
+        return self._dataset
+
+    def coordinates(self) -> xr.Dataset:
+        """
+        Dataset with the index coordinates, but none of the data, of the graph
+        returned by to_dataset().
+        """
+        pending = self.node_blocks[self._n_coordinates :]
+        if len(pending) > 0:
+            self._coordinates = self.merge_node_blocks(
+                [xr.Dataset(coords=block.indexes) for block in pending],
+                nodes=self._coordinates,
+            )
+            self._n_coordinates = len(self.node_blocks)
+        return self._coordinates if self._coordinates is not None else xr.Dataset()
+
+    def select_current_samples(self, containers, locations) -> xr.Dataset:
+        """
+        Get the latest sample at each container and location, gathered from the
+        node blocks where they were added.
+
+        Parameters
+        ----------
+        containers : array_like
+            containers to select
+        locations : array_like
+            locations to select
+
+        Returns
+        -------
+        xr.Dataset
+            sample_location and contents of the selected containers and
+            locations, in the order of the graph coordinates
+        """
+        coordinates = self.coordinates()
+        if Strings.CONTAINER not in coordinates or Strings.LOCATION not in coordinates:
+            return xr.Dataset()
+        requested_containers = set(np.atleast_1d(containers).tolist())
+        requested_locations = set(np.atleast_1d(locations).tolist())
+        containers = [
+            c for c in coordinates[Strings.CONTAINER].data if c in requested_containers
+        ]
+        locations = [
+            l
+            for l in coordinates[Strings.LOCATION].data
+            if l in requested_locations
+            and any((c, l) in self.current_samples for c in containers)
+        ]
+        containers = [
+            c
+            for c in containers
+            if any((c, l) in self.current_samples for l in locations)
+        ]
+        if len(containers) == 0 or len(locations) == 0:
+            return xr.Dataset()
+        reagents = (
+            coordinates[Strings.REAGENT].data
+            if Strings.REAGENT in coordinates
+            else np.array([])
+        )
+
+        # Group the wells by the block and tick of their current sample
+        wells = {}
+        for i, c in enumerate(containers):
+            for j, l in enumerate(locations):
+                if (c, l) in self.current_samples:
+                    wells.setdefault(self.current_samples[(c, l)], []).append((i, j))
+
+        sample_location = np.full((len(containers), len(locations)), nan, dtype=object)
+        contents = np.full((len(containers), len(locations), len(reagents)), nan)
+        for (block_index, tick), indices in wells.items():
+            rows, columns = (np.array(index) for index in zip(*indices))
+            block = self.node_blocks[block_index].sel({Strings.TICK: tick})
+            points = {
+                Strings.CONTAINER: xr.DataArray(
+                    np.array(containers)[rows], dims="well"
+                ),
+                Strings.LOCATION: xr.DataArray(
+                    np.array(locations)[columns], dims="well"
+                ),
+            }
+            sample_location[rows, columns] = block.sample_location.sel(points).data
+            if Strings.CONTENTS in block and Strings.REAGENT in block.dims:
+                contents[rows, columns] = (
+                    block.contents.sel(points)
+                    .reindex({Strings.REAGENT: reagents})
+                    .transpose("well", Strings.REAGENT)
+                    .data
+                )
+
+        data = {
+            Strings.SAMPLE_LOCATION: xr.DataArray(
+                sample_location, dims=(Strings.CONTAINER, Strings.LOCATION)
+            ),
+            Strings.CONTENTS: xr.DataArray(
+                contents,
+                dims=(Strings.CONTAINER, Strings.LOCATION, Strings.REAGENT),
+            ),
+        }
+        # Order the variables like the graph, which has the order of the latest block
+        order = [v for v in self.node_blocks[-1].data_vars if v in data]
+        selection = xr.Dataset(
+            {v: data[v] for v in order + [v for v in data if v not in order]},
+            coords={
+                **{
+                    k: v
+                    for k, v in coordinates.coords.items()
+                    if k not in [Strings.TICK, Strings.CONTAINER, Strings.LOCATION]
+                },
+                Strings.CONTAINER: containers,
+                Strings.LOCATION: locations,
+                Strings.REAGENT: reagents,
+                Strings.NODE: self.edge_columns[: self.n_edge_columns[-1]],
+            },
+        )
+        if len(wells) == 1:
+            selection = selection.assign_coords({Strings.TICK: next(iter(wells))[1]})
+        return selection
+
+    def index_edges(self) -> None:
+        """
+        Add the edges of the blocks appended since the last call to the
+        predecessors and successors indices.
+        """
+        for block_index in range(self._n_indexed, len(self.edge_offsets)):
+            rows = self.block_edges(block_index, 2)
+            rows = rows[~pd.isnull(rows).any(axis=1)]
+            for sample, next_sample in rows:
+                self.predecessors.setdefault(next_sample, set()).add(sample)
+                self.successors.setdefault(sample, set()).add(next_sample)
+        self._n_indexed = len(self.edge_offsets)
+
+    def lineage(
+        self,
+        samples: Iterable[str],
+        depth: Optional[int] = None,
+        descendants: bool = False,
+    ) -> Dict[str, Set[str]]:
+        """
+        Find the ancestors (or descendants) of each sample, including the
+        sample itself.
+
+        Parameters
+        ----------
+        samples : Iterable[str]
+            sample ids
+        depth : Optional[int]
+            maximum number of edges between a sample and its ancestors
+            (default: no maximum)
+        descendants : bool
+            find descendants instead of ancestors
+
+        Returns
+        -------
+        Dict[str, Set[str]]
+            related sample ids for each sample
+        """
+        self.index_edges()
+        adjacent = self.successors if descendants else self.predecessors
+        related = {}
+        for sample in samples:
+            found = {sample}
+            frontier = [sample]
+            hops = 0
+            while frontier and (depth is None or hops < depth):
+                next_frontier = []
+                for s in frontier:
+                    for a in adjacent.get(s, ()):
+                        if a not in found:
+                            found.add(a)
+                            next_frontier.append(a)
+                frontier = next_frontier
+                hops += 1
+            related[sample] = found
+        return related
+
+
 class SampleProvenanceObserver:
     """
     Tracks sample provenance over time, forming a directed graph.
@@ -32,58 +682,221 @@ class SampleProvenanceObserver:
 
     - TransferByMap
     - EmptyContainer
+
+    Other behaviors are tracked by registering an updater for them with
+    register_updater().
+
+    Rendering the graph is not needed to track samples, and is off by default.
+    Snapshots of the graph after each tracked step can be rendered after
+    execution with render_snapshots().  When render is True, each snapshot is
+    rendered once it is taken, by a pool of render_workers background threads
+    if render_workers > 0, so that execution continues during rendering.
+
+    When persist is True, the graph is written to {outdir}/{name}_store as it
+    grows, and can be reloaded with load().  An observer created on an outdir
+    that already has a store continues its graph and snapshots.
     """
 
-    def __init__(self, outdir, name="sample_graph") -> None:
-        self.graph = xr.Dataset()
+    def __init__(
+        self,
+        outdir,
+        name="sample_graph",
+        render: bool = False,
+        render_workers: int = 0,
+        persist: bool = False,
+    ) -> None:
+        self.graph_store = ProvenanceGraphStore(
+            directory=self.store_directory(outdir, name) if persist else None
+        )
+        # (exec_tick, number of graph_store blocks) after each tracked step that changed the graph
+        self.snapshot_ticks: List[Tuple[int, int]] = [
+            (tick, n_blocks + 1)
+            for n_blocks, tick in enumerate(self.graph_store.block_ticks)
+            if tick is not None
+        ]
+        self.render = render
+        self.render_workers = render_workers
+        self.render_pool = None
+        self.render_futures: List[Future] = []
 
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.DEBUG)
-        self.exec_tick = 0
+        self.exec_tick = self.snapshot_ticks[-1][0] + 1 if self.snapshot_ticks else 0
         self.outdir = outdir
         self.name = name
-        self.handlers = {
-            "https://bioprotocols.org/labop/primitives/liquid_handling/TransferByMap": TransferByMapUpdater,
-            "https://bioprotocols.org/labop/primitives/liquid_handling/Transfer": TransferUpdater,
-            "https://bioprotocols.org/labop/primitives/liquid_handling/Vortex": VortexUpdater,
-            "https://bioprotocols.org/labop/primitives/sample_arrays/EmptyContainer": EmptyContainerUpdater,
-            "https://bioprotocols.org/labop/primitives/liquid_handling/Provision": ProvisionUpdater,
-            "https://bioprotocols.org/labop/primitives/liquid_handling/SerialDilution": SerialDilutionUpdater,
-        }
+        # Updater singletons, by updater class
+        self.updaters: Dict[type, BaseUpdater] = {}
+        # Updater (or None, if untracked) for each CallBehaviorAction node URI
+        self.node_updaters: Dict[str, Optional[BaseUpdater]] = {}
         self.ureg = UnitRegistry()
 
     def update(self, record: ActivityNodeExecution) -> None:
         """
         Hook to update the provenance graph after each step of execution.
         """
-        # call = record.call.lookup()
-        behavior = record.node.lookup().behavior.lookup()
-        # inputs = [
-        #     x
-        #     for x in call.parameter_values
-        #     if x.parameter.lookup().property_value.direction == uml.PARAMETER_IN
-        # ]
-        # iparams = input_parameter_map(inputs)
-
-        if behavior.identity in self.handlers:
-            updater = self.handlers[behavior.identity](self)
-            new_nodes = updater.update(record)
-            if new_nodes:
-                self.graph = self.update_graph(new_nodes)
-                self.to_dot().render(
-                    os.path.join(self.outdir, f"{self.name}_{self.exec_tick}")
-                )
-            self.exec_tick += 1
-        else:
+        node = str(record.node)
+        updater = self.node_updaters.get(node)
+        if updater is None and node not in self.node_updaters:
+            updater = self.node_updaters[node] = self.updater_for(record.node.lookup())
+        if updater is None:
+            return
+
+        new_nodes = updater.update(record)
+        if new_nodes:
+            self.graph_store.append(new_nodes, tick=self.exec_tick)
+            self.snapshot_ticks.append((self.exec_tick, len(self.graph_store)))
+            if self.render:
+                self.submit_render(self.exec_tick, max_workers=self.render_workers)
+        self.exec_tick += 1
+
+    @property
+    def handlers(self) -> Dict[str, type]:
+        """
+        Updater classes, by behavior URI.
+        """
+        return UPDATERS
+
+    def updater_for(self, node: "uml.ActivityNode") -> Optional["BaseUpdater"]:
+        """
+        Get the updater for the behavior of node, or None if the node is not a
+        CallBehaviorAction or its behavior is not tracked.  Updaters are
+        instantiated once per observer.
+        """
+        if not isinstance(node, uml.CallBehaviorAction):
+            return None
+        behavior = str(node.behavior)
+        if behavior not in UPDATERS:
             self.logger.info(
                 "Behavior %s is not handled by %s, skipping ...",
                 behavior,
                 self.__class__,
             )
+            return None
+        updater_class = UPDATERS[behavior]
+        if updater_class not in self.updaters:
+            self.updaters[updater_class] = updater_class(self)
+        return self.updaters[updater_class]
+
+    def snapshot(self, tick: Optional[int] = None) -> xr.Dataset:
+        """
+        Get the graph as it was after the tracked step at tick.
+
+        Parameters
+        ----------
+        tick : Optional[int]
+            exec_tick of the snapshot (default: the latest snapshot)
+        """
+        if tick is None:
+            return self.graph
+        n_blocks = 0
+        for snapshot_tick, snapshot_blocks in self.snapshot_ticks:
+            if snapshot_tick > tick:
+                break
+            n_blocks = snapshot_blocks
+        return self.graph_store.to_dataset(n_blocks=n_blocks)
+
+    def render_snapshot(self, tick: Optional[int] = None, graph=None) -> str:
+        """
+        Render the snapshot at tick as {outdir}/{name}_{tick}, returning the
+        path of the rendered file.
+        """
+        if tick is None:
+            tick = self.snapshot_ticks[-1][0] if self.snapshot_ticks else 0
+        if graph is None:
+            graph = self.snapshot(tick)
+        return self.to_dot(graph=graph).render(
+            os.path.join(self.outdir, f"{self.name}_{tick}")
+        )
+
+    def submit_render(self, tick: int, max_workers: int = 0) -> Future:
+        """
+        Render the snapshot at tick in a pool of max_workers background
+        threads, or immediately if max_workers is 0.
+        """
+        graph = self.snapshot(tick)
+        if max_workers > 0:
+            if self.render_pool is None:
+                self.render_pool = ThreadPoolExecutor(max_workers=max_workers)
+            future = self.render_pool.submit(self.render_snapshot, tick, graph)
+        else:
+            future = Future()
+            future.set_result(self.render_snapshot(tick, graph))
+        self.render_futures.append(future)
+        return future
+
+    def render_snapshots(
+        self, ticks: Optional[List[int]] = None, max_workers: int = 0
+    ) -> List[str]:
+        """
+        Render the snapshots at ticks (default: all snapshots), and wait for
+        all submitted renders to finish.
+
+        Returns
+        -------
+        Paths of the rendered files
+        """
+        if ticks is None:
+            ticks = [tick for tick, _ in self.snapshot_ticks]
+        for tick in ticks:
+            self.submit_render(tick, max_workers=max_workers)
+        return self.wait_for_renders()
+
+    def wait_for_renders(self) -> List[str]:
+        """
+        Wait for the submitted renders to finish, returning the paths of the
+        rendered files.
+        """
+        paths = [future.result() for future in self.render_futures]
+        self.render_futures = []
+        if self.render_pool is not None:
+            self.render_pool.shutdown()
+            self.render_pool = None
+        return paths
+
+    @property
+    def graph(self) -> xr.Dataset:
+        """
+        Sample provenance graph, materialized from the graph_store.
+        """
+        return self.graph_store.to_dataset()
+
+    @graph.setter
+    def graph(self, graph: xr.Dataset) -> None:
+        self.graph_store = ProvenanceGraphStore(
+            directory=self.graph_store.directory, resume=False
+        )
+        if graph:
+            self.graph_store.append(graph)
+
+    @staticmethod
+    def store_directory(outdir: str, name: str = "sample_graph") -> str:
+        return os.path.join(outdir, f"{name}_store")
+
+    @classmethod
+    def load(
+        cls, outdir: str, name: str = "sample_graph"
+    ) -> "SampleProvenanceObserver":
+        """
+        Load the graph of an observer that was created with persist=True.
+
+        Parameters
+        ----------
+        outdir : str
+            outdir of the observer
+        name : str
+            name of the observer
+
+        Returns
+        -------
+        SampleProvenanceObserver
+            observer with the graph and snapshots of the persisted observer
+        """
+        return cls(outdir, name=name, persist=True)
 
     def update_graph(self, graph_addition, graph=None):
         """
-        Add new_nodes and associated edges to the graph.
+        Add new_nodes and associated edges to the graph, returning the combined
+        graph.  The observer's own graph is extended in place by graph_store.append().
 
         Parameters
         ----------
@@ -127,31 +940,55 @@ class SampleProvenanceObserver:
         return new_graph
 
     def sample_provenance(self, sample_id: str, depth: int = None):
-        samples = xr.DataArray([sample_id], dims=("edge"))
-        all_samples = samples
-        updated = True
-        count = 0
-        while updated:
-            prev_samples = self.graph.edges.where(
-                self.graph.edges.loc[:, "next_sample_location"].isin(samples)
-            ).dropna("edge", how="all")[:, 0:1][:, 0]
-            updated = len(prev_samples) > 0
-            all_samples = xr.DataArray(
-                np.unique(xr.concat([all_samples, prev_samples], dim="edge").data),
-                dims=("edge"),
-            )
-            samples = prev_samples
-            count += 1
-            if depth is not None and count >= depth:
-                break
-        return all_samples
+        """
+        Get the sample and its ancestors, up to depth edges away.
+        """
+        return self.sample_lineage([sample_id], depth=depth)[sample_id]
+
+    def sample_lineage(
+        self,
+        sample_ids: Iterable[str],
+        depth: int = None,
+        descendants: bool = False,
+    ) -> Dict[str, xr.DataArray]:
+        """
+        Get the ancestors (or descendants) of several samples, e.g., all samples
+        of a plate, at once.
+
+        Parameters
+        ----------
+        sample_ids : Iterable[str]
+            sample ids
+        depth : int
+            maximum number of edges to follow (default: no maximum)
+        descendants : bool
+            get the descendants instead of the ancestors
+
+        Returns
+        -------
+        Dict[str, xr.DataArray]
+            sorted ids of each sample and its related samples
+        """
+        lineage = self.graph_store.lineage(
+            sample_ids, depth=depth, descendants=descendants
+        )
+        return {
+            sample_id: xr.DataArray(np.unique(list(related)), dims=("edge"))
+            for sample_id, related in lineage.items()
+        }
 
     def to_dot(
-        self, dpi=None, for_samples: xr.DataArray = None, draw_transitions=False
+        self,
+        dpi=None,
+        for_samples: xr.DataArray = None,
+        draw_transitions=False,
+        graph: xr.Dataset = None,
     ):
         """
-        Plot graph of samples
+        Plot graph of samples (default: the current graph)
         """
+        if graph is None:
+            graph = self.graph
 
         def _container_name(container):
             c = str(container).split("/")[-1]
@@ -193,14 +1030,14 @@ class SampleProvenanceObserver:
             node_attr={"ordering": "out"},
         )
 
-        sample_info = self.get_sample_info()
+        sample_info = self.get_sample_info(graph=graph)
         sample_info = (
             sample_info.where(sample_info.isin(for_samples)).dropna("index")
             if for_samples is not None
             else sample_info
         )
         subgraph = (
-            self.graph
+            graph
             # .where(self.graph.isin(sample_info))
             # .dropna("tick", how="all")
             # .dropna("location", how="all")
@@ -360,8 +1197,22 @@ class SampleProvenanceObserver:
     def select_samples_from_graph(
         self, sample_array: xr.DataArray, graph: xr.Dataset = None
     ):
+        """
+        Get the latest sample in each container and location of sample_array.
+
+        Parameters
+        ----------
+        sample_array : xr.DataArray
+            array with the container and location coordinates to select
+        graph : xr.Dataset
+            graph to select from (default: the observer's graph, where the
+            samples are looked up in graph_store.current_samples)
+        """
         if graph is None:
-            graph = self.graph
+            return self.graph_store.select_current_samples(
+                sample_array[Strings.CONTAINER].data,
+                sample_array[Strings.LOCATION].data,
+            )
         sample_array_subgraph = (
             self.drop_graph_edges(graph=graph)
             .where(  # self.graph.sample.isin(sample_array.sample),
@@ -450,46 +1301,202 @@ class SampleProvenanceObserver:
     def make_transfer_array(
         self, source_array: xr.Dataset, target_array: xr.Dataset, amount: float
     ) -> xr.DataArray:
-        transfer = xr.DataArray(
-            [
+        """
+        Make a transfer plan that transfers amount from each source aliquot to
+        each target aliquot.
+
+        Returns
+        -------
+        xr.DataArray
+            Dense transfer plan with the dimensions source_container,
+            source_location, target_container, and target_location.  Every
+            element is amount, so the plan is a read-only broadcast of a single
+            value rather than an array of the same amount for each pair.
+        """
+        coords = {
+            Strings.SOURCE_CONTAINER: source_array[Strings.CONTAINER].data,
+            Strings.SOURCE_LOCATION: source_array[Strings.LOCATION].data,
+            Strings.TARGET_CONTAINER: target_array[Strings.CONTAINER].data,
+            Strings.TARGET_LOCATION: target_array[Strings.LOCATION].data,
+        }
+        return xr.DataArray(
+            np.broadcast_to(
+                np.asarray(amount, dtype=float), [len(c) for c in coords.values()]
+            ),
+            dims=tuple(coords),
+            coords=coords,
+        )
+
+    def sparse_transfer_array(
+        self,
+        amounts,
+        source_containers,
+        source_locations,
+        target_containers,
+        target_locations,
+    ) -> xr.DataArray:
+        """
+        Make a transfer plan in coordinate (COO) format, where each element of
+        the "transfer" dimension is the amount transferred from the source
+        container and location to the target container and location.
+        """
+        return xr.DataArray(
+            np.asarray(amounts, dtype=float),
+            dims=(Strings.TRANSFER,),
+            coords={
+                Strings.SOURCE_CONTAINER: (Strings.TRANSFER, source_containers),
+                Strings.SOURCE_LOCATION: (Strings.TRANSFER, source_locations),
+                Strings.TARGET_CONTAINER: (Strings.TRANSFER, target_containers),
+                Strings.TARGET_LOCATION: (Strings.TRANSFER, target_locations),
+            },
+        )
+
+    def sparse_transfer_plan(
+        self,
+        transfer: xr.DataArray,
+        sources: xr.DataArray,
+        targets: xr.DataArray,
+    ) -> Tuple[xr.DataArray, xr.DataArray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Find the nonzero amounts of a transfer plan, and the sources and
+        targets that they are transferred between.
+
+        Parameters
+        ----------
+        transfer : xr.DataArray
+            Transfer plan, either dense with the dimensions source_container,
+            source_location, target_container, and target_location, or sparse as
+            made by sparse_transfer_array()
+        sources : xr.DataArray
+            Source data with the leading dimensions source_container and source_location
+        targets : xr.DataArray
+            Target data with the leading dimensions target_container and target_location
+
+        Returns
+        -------
+        sources and targets restricted to the locations that the plan refers
+        to, the flat source and target location index of each transfer, and the
+        amount of each transfer
+        """
+        if Strings.TRANSFER in transfer.dims:
+            source_index = pd.MultiIndex.from_product(
                 [
+                    sources[Strings.SOURCE_CONTAINER].data,
+                    sources[Strings.SOURCE_LOCATION].data,
+                ]
+            ).get_indexer(
+                pd.MultiIndex.from_arrays(
                     [
-                        [
-                            amount
-                            for target_aliquot in target_array.sel(container=target)[
-                                Strings.LOCATION
-                            ]
-                        ]
-                        for target in target_array[Strings.CONTAINER]
-                    ]
-                    for source_aliquot in source_array.sel(container=source)[
-                        Strings.LOCATION
+                        transfer[Strings.SOURCE_CONTAINER].data,
+                        transfer[Strings.SOURCE_LOCATION].data,
                     ]
+                )
+            )
+            target_index = pd.MultiIndex.from_product(
+                [
+                    targets[Strings.TARGET_CONTAINER].data,
+                    targets[Strings.TARGET_LOCATION].data,
                 ]
-                for source in source_array[Strings.CONTAINER]
-            ],
-            dims=(
+            ).get_indexer(
+                pd.MultiIndex.from_arrays(
+                    [
+                        transfer[Strings.TARGET_CONTAINER].data,
+                        transfer[Strings.TARGET_LOCATION].data,
+                    ]
+                )
+            )
+            amounts = transfer.data
+            nonzero = (source_index >= 0) & (target_index >= 0)
+        else:
+            # Restrict the sources and targets to the locations in the plan
+            # (and vice versa), as arithmetic with the plan would.
+            sources, transfer = xr.align(sources, transfer, join="inner")
+            targets, transfer = xr.align(targets, transfer, join="inner")
+            dense = transfer.transpose(
                 Strings.SOURCE_CONTAINER,
                 Strings.SOURCE_LOCATION,
                 Strings.TARGET_CONTAINER,
                 Strings.TARGET_LOCATION,
-            ),
+            ).data
+            # Only the index of each transfer is allocated, not a copy of the plan
+            index = np.nonzero((dense != 0) & ~np.isnan(dense))
+            source_index = np.ravel_multi_index(index[:2], dense.shape[:2])
+            target_index = np.ravel_multi_index(index[2:], dense.shape[2:])
+            amounts = dense[index]
+            nonzero = np.full(amounts.shape, True)
+        nonzero &= (amounts != 0) & ~np.isnan(amounts)
+        return (
+            sources,
+            targets,
+            source_index[nonzero],
+            target_index[nonzero],
+            amounts[nonzero],
+        )
+
+    def apply_transfer_plan(
+        self,
+        concentration: xr.DataArray,
+        source_index: np.ndarray,
+        target_index: np.ndarray,
+        amounts: np.ndarray,
+        target_coords: xr.DataArray,
+    ) -> Tuple[xr.DataArray, xr.DataArray]:
+        """
+        Compute the contents removed from each source and added to each target
+        by a sparse transfer plan.
+
+        Returns
+        -------
+        Amount of each reagent removed from the sources and added to the targets
+        """
+        concentration = concentration.transpose(
+            Strings.SOURCE_CONTAINER, Strings.SOURCE_LOCATION, ...
+        )
+        n_sources = concentration.shape[0] * concentration.shape[1]
+        n_targets = target_coords.shape[0] * target_coords.shape[1]
+        flat_concentration = concentration.data.reshape(n_sources, -1)
+        # Reagents of empty sources count as 0
+        flat_concentration = np.where(
+            np.isnan(flat_concentration), 0.0, flat_concentration
+        )
+        n_reagents = flat_concentration.shape[1]
+
+        # Sum the amount of each reagent in each transfer one reagent at a time,
+        # so that the temporary arrays are the size of the transfers.
+        removed = np.zeros((n_sources, n_reagents))
+        added = np.zeros((n_targets, n_reagents))
+        for reagent in range(n_reagents):
+            transferred = flat_concentration[source_index, reagent] * amounts
+            removed[:, reagent] = np.bincount(
+                source_index, weights=transferred, minlength=n_sources
+            )
+            added[:, reagent] = np.bincount(
+                target_index, weights=transferred, minlength=n_targets
+            )
+
+        removed = xr.DataArray(
+            removed.reshape(concentration.shape),
+            dims=concentration.dims,
             coords={
-                Strings.SOURCE_CONTAINER: source_array[Strings.CONTAINER].rename(
-                    {Strings.CONTAINER: Strings.SOURCE_CONTAINER}
-                ),
-                Strings.SOURCE_LOCATION: source_array[Strings.LOCATION].rename(
-                    {Strings.LOCATION: Strings.SOURCE_LOCATION}
-                ),
-                Strings.TARGET_CONTAINER: target_array[Strings.CONTAINER].rename(
-                    {Strings.CONTAINER: Strings.TARGET_CONTAINER}
-                ),
-                Strings.TARGET_LOCATION: target_array[Strings.LOCATION].rename(
-                    {Strings.LOCATION: Strings.TARGET_LOCATION}
-                ),
+                d: concentration[d]
+                for d in concentration.dims
+                if d in concentration.coords
             },
         )
-        return transfer
+        target_dims = target_coords.dims[:2] + concentration.dims[2:]
+        added = xr.DataArray(
+            added.reshape(target_coords.shape[:2] + concentration.shape[2:]),
+            dims=target_dims,
+            coords={
+                **{d: target_coords[d] for d in target_coords.dims[:2]},
+                **{
+                    d: concentration[d]
+                    for d in concentration.dims[2:]
+                    if d in concentration.coords
+                },
+            },
+        )
+        return removed, added
 
     def compute_transfer(
         self,
@@ -519,15 +1526,27 @@ class SampleProvenanceObserver:
         transfer_source[
             Strings.CONCENTRATION
         ] = transfer_source.contents / transfer_source.contents.sum(dim=Strings.REAGENT)
-        # Get amount of each aliquot's contents that is transferred
-        amount_transferred = transfer_source.concentration * transfer
-
-        # Get total amount transferred to all targets
-        next_source_contents = transfer_source[
-            Strings.CONTENTS
-        ] - amount_transferred.sum(
-            dim=[Strings.TARGET_LOCATION, Strings.TARGET_CONTAINER]
+        # Get the transfers with a nonzero amount
+        (
+            concentration,
+            target_sample_location,
+            source_index,
+            target_index,
+            amounts,
+        ) = self.sparse_transfer_plan(
+            transfer,
+            transfer_source.concentration,
+            transfer_target.sample_location.transpose(
+                Strings.TARGET_CONTAINER, Strings.TARGET_LOCATION
+            ),
+        )
+        # Get amount of each aliquot's contents that is transferred to all targets
+        # and from all sources
+        amount_removed, amount_added = self.apply_transfer_plan(
+            concentration, source_index, target_index, amounts, target_sample_location
         )
+
+        next_source_contents = transfer_source[Strings.CONTENTS] - amount_removed
         next_source_contents = next_source_contents.rename(
             {
                 Strings.SOURCE_LOCATION: Strings.LOCATION,
@@ -538,11 +1557,7 @@ class SampleProvenanceObserver:
             next_source_contents != 0.0, nan
         )
 
-        next_target_contents = transfer_target[
-            Strings.CONTENTS
-        ] + amount_transferred.sum(
-            dim=[Strings.SOURCE_LOCATION, Strings.SOURCE_CONTAINER]
-        )
+        next_target_contents = transfer_target[Strings.CONTENTS] + amount_added
         next_target_contents = next_target_contents.rename(
             {
                 Strings.TARGET_LOCATION: Strings.LOCATION,
@@ -557,10 +1572,11 @@ class SampleProvenanceObserver:
         #     {Strings.SAMPLE: [new_sample_id() for _ in transfer_source.sample]}
         # )
 
-        next_source_sample_ids = [
-            [source_samples.new_sample_id() for loc in transfer_source.source_location]
-            for c in transfer_source.source_container
-        ]
+        next_source_sample_ids = source_samples.new_sample_ids(
+            transfer_source.source_container.size * transfer_source.source_location.size
+        ).reshape(
+            transfer_source.source_container.size, transfer_source.source_location.size
+        )
         next_source_array = xr.Dataset(
             {
                 Strings.SAMPLE_LOCATION: xr.DataArray(
@@ -574,14 +1590,15 @@ class SampleProvenanceObserver:
                     Strings.SOURCE_CONTAINER
                 ].data,
                 Strings.LOCATION: transfer_source.coords[Strings.SOURCE_LOCATION].data,
-                Strings.SAMPLE: [s for c in next_source_sample_ids for s in c],
+                Strings.SAMPLE: next_source_sample_ids.reshape(-1),
             },
         )
 
-        next_target_sample_ids = [
-            [target_samples.new_sample_id() for loc in transfer_target.target_location]
-            for c in transfer_target.target_container
-        ]
+        next_target_sample_ids = target_samples.new_sample_ids(
+            transfer_target.target_container.size * transfer_target.target_location.size
+        ).reshape(
+            transfer_target.target_container.size, transfer_target.target_location.size
+        )
         next_target_array = xr.Dataset(
             {
                 Strings.SAMPLE_LOCATION: xr.DataArray(
@@ -595,111 +1612,56 @@ class SampleProvenanceObserver:
                     Strings.TARGET_CONTAINER
                 ].data,
                 Strings.LOCATION: transfer_target.coords[Strings.TARGET_LOCATION].data,
-                Strings.SAMPLE: [s for c in next_target_sample_ids for s in c],
+                Strings.SAMPLE: next_target_sample_ids.reshape(-1),
             },
         )
 
-        source_map = xr.merge(
-            [
-                source_array.sample_location,
-                next_source_array.rename(
-                    {Strings.SAMPLE_LOCATION: Strings.NEXT_SAMPLE_LOCATION}
-                ).next_sample_location,
-            ]
-        )
-        source_edges = (
-            source_map.to_array()
-            .rename({Strings.VARIABLE: Strings.NODE})
-            .transpose(Strings.CONTAINER, Strings.LOCATION, Strings.NODE)
-        ).rename(
-            {
-                Strings.CONTAINER: Strings.SOURCE_CONTAINER,
-                Strings.LOCATION: Strings.SOURCE_LOCATION,
-            }
-        )
-        source_edges.name = "s"
-        target_map = xr.merge(
-            [
-                target_array.sample_location,
-                next_target_array.rename(
-                    {Strings.SAMPLE_LOCATION: Strings.NEXT_SAMPLE_LOCATION}
-                ).next_sample_location,
-            ]
-        )
-        target_edges = (
-            target_map.to_array()
-            .rename({Strings.VARIABLE: Strings.NODE})
-            .transpose(Strings.CONTAINER, Strings.LOCATION, Strings.NODE)
-        ).rename(
-            {
-                Strings.CONTAINER: Strings.TARGET_CONTAINER,
-                Strings.LOCATION: Strings.TARGET_LOCATION,
-            }
-        )
-        target_edges.name = "t"
-        transfer_map = xr.merge(
-            [
-                transfer_source.sample_location,
-                next_target_array.rename(
-                    {
-                        Strings.SAMPLE_LOCATION: Strings.NEXT_SAMPLE_LOCATION,
-                        Strings.CONTAINER: Strings.TARGET_CONTAINER,
-                        Strings.LOCATION: Strings.TARGET_LOCATION,
-                    }
-                ).next_sample_location,
-            ]
-        )
-        transfer_plan_map = transfer_map.where(
-            transfer > 0
-        )  # xr.where(transfer > 0, transfer_map, False)
-        transfer_edges = (
-            transfer_plan_map.to_array().rename({Strings.VARIABLE: Strings.NODE})
-            # .stack(
-            #     container=[Strings.SOURCE_CONTAINER, Strings.TARGET_CONTAINER],
-            #     location=[Strings.SOURCE_LOCATION, Strings.TARGET_LOCATION],
-            # )
-            # .transpose(Strings.CONTAINER, Strings.LOCATION, Strings.EDGE)
-            .transpose(
-                Strings.SOURCE_CONTAINER,
-                Strings.SOURCE_LOCATION,
-                Strings.TARGET_CONTAINER,
-                Strings.TARGET_LOCATION,
-                Strings.NODE,
+        # Each source and target aliquot has an edge to its next sample, and
+        # each source has an edge to the next sample of each target that it
+        # transfers to.
+        source_edges = self.create_persistence_edges(source_array, next_source_array)
+        target_edges = self.create_persistence_edges(target_array, next_target_array)
+        transferred = amounts > 0
+        source_ids = (
+            transfer_source.sample_location.sel(
+                {
+                    Strings.SOURCE_CONTAINER: concentration[Strings.SOURCE_CONTAINER],
+                    Strings.SOURCE_LOCATION: concentration[Strings.SOURCE_LOCATION],
+                }
             )
+            .transpose(Strings.SOURCE_CONTAINER, Strings.SOURCE_LOCATION)
+            .data.reshape(-1)
         )
-        transfer_edges.name = "tr"
-
-        all_edges = (
-            xr.merge([source_edges, target_edges, transfer_edges])
-            .transpose(
-                Strings.SOURCE_CONTAINER,
-                Strings.SOURCE_LOCATION,
-                Strings.TARGET_CONTAINER,
-                Strings.TARGET_LOCATION,
-                Strings.NODE,
-            )
-            .stack(
-                edge=[
-                    Strings.SOURCE_CONTAINER,
-                    Strings.SOURCE_LOCATION,
-                    Strings.TARGET_CONTAINER,
-                    Strings.TARGET_LOCATION,
-                ]
+        next_target_ids = (
+            next_target_array.sample_location.sel(
+                {
+                    Strings.CONTAINER: target_sample_location[
+                        Strings.TARGET_CONTAINER
+                    ].data,
+                    Strings.LOCATION: target_sample_location[
+                        Strings.TARGET_LOCATION
+                    ].data,
+                }
             )
+            .transpose(Strings.CONTAINER, Strings.LOCATION)
+            .data.reshape(-1)
+        )
+        transfer_edges = xr.DataArray(
+            np.stack(
+                [
+                    source_ids[source_index[transferred]],
+                    next_target_ids[target_index[transferred]],
+                ],
+                axis=1,
+            ).astype(object),
+            dims=(Strings.EDGE, Strings.NODE),
+            coords={
+                Strings.NODE: [Strings.SAMPLE_LOCATION, Strings.NEXT_SAMPLE_LOCATION]
+            },
         )
 
-        concat_edges = xr.concat(
-            [all_edges.s, all_edges.t, all_edges.tr], dim=Strings.EDGE
-        ).transpose(Strings.EDGE, Strings.NODE)
-
-        edges = concat_edges.reset_index(Strings.EDGE).reset_coords(
-            names=[
-                Strings.SOURCE_CONTAINER,
-                Strings.SOURCE_LOCATION,
-                Strings.TARGET_CONTAINER,
-                Strings.TARGET_LOCATION,
-            ],
-            drop=True,
+        edges = xr.concat(
+            [source_edges, target_edges, transfer_edges], dim=Strings.EDGE
         )
         edges.name = Strings.EDGES
 
@@ -870,10 +1832,9 @@ class ProvisionUpdater(BaseUpdater):
 
         # Construct next sample array using updated contents of sample array
         # Create new sample ids for the updated array
-        new_samples = [
-            [destination.new_sample_id() for l in sample_array.location]
-            for c in sample_array.container
-        ]
+        new_samples = destination.new_sample_ids(
+            sample_array.container.size * sample_array.location.size
+        ).reshape(sample_array.container.size, sample_array.location.size)
 
         next_sample_array = xr.Dataset(
             {
@@ -888,7 +1849,7 @@ class ProvisionUpdater(BaseUpdater):
                 ),
             },
             coords={
-                Strings.SAMPLE: [l for c in new_samples for l in c],
+                Strings.SAMPLE: new_samples.reshape(-1),
             },
         )
 
@@ -992,7 +1953,7 @@ class VortexUpdater(BaseUpdater):
         samples = parameter_values["samples"]
 
         series_array = self.observer.select_samples_from_graph(
-            samples.to_data_array(), graph=self.observer.graph
+            samples.to_data_array()
         ).reset_coords(drop=True)
 
         return xr.Dataset()
@@ -1042,7 +2003,7 @@ class SerialDilutionUpdater(BaseUpdater):
             # t_coord = series_array.where(
             #     series_array.location == coordinates[i + 1], drop=True
             # )
-            source_graph = graph_addition if graph_addition else self.observer.graph
+            source_graph = graph_addition if graph_addition else None
             source_loc = self.observer.select_samples_from_graph(
                 coordinates[i], graph=source_graph
             ).reset_coords(drop=True)
@@ -1050,7 +2011,7 @@ class SerialDilutionUpdater(BaseUpdater):
                 graph_addition
                 if graph_addition
                 and coordinates[i + 1].isin(graph_addition.sample_location).data[()]
-                else self.observer.graph
+                else None
             )
             target_loc = self.observer.select_samples_from_graph(
                 coordinates[i + 1], graph=target_graph
@@ -1076,3 +2037,47 @@ class SerialDilutionUpdater(BaseUpdater):
             self.observer.exec_tick += 1
 
         return graph_addition
+
+
+# Updater classes, by the URI of the behavior they track
+UPDATERS: Dict[str, type] = {}
+
+
+def register_updater(behavior: str, updater: Optional[type] = None):
+    """
+    Register the updater class that tracks samples for a behavior.  Can also be
+    used as a class decorator:
+
+        @register_updater("https://bioprotocols.org/labop/primitives/culturing/Culture")
+        class CultureUpdater(BaseUpdater):
+            ...
+
+    Parameters
+    ----------
+    behavior : str
+        URI of the behavior (e.g., a Primitive)
+    updater : Optional[type]
+        subclass of BaseUpdater
+
+    Returns
+    -------
+    type or decorator
+        the updater, or a decorator that registers it
+    """
+
+    def register(updater: type) -> type:
+        UPDATERS[str(behavior)] = updater
+        return updater
+
+    return register if updater is None else register(updater)
+
+
+for behavior, updater in {
+    "https://bioprotocols.org/labop/primitives/liquid_handling/TransferByMap": TransferByMapUpdater,
+    "https://bioprotocols.org/labop/primitives/liquid_handling/Transfer": TransferUpdater,
+    "https://bioprotocols.org/labop/primitives/liquid_handling/Vortex": VortexUpdater,
+    "https://bioprotocols.org/labop/primitives/sample_arrays/EmptyContainer": EmptyContainerUpdater,
+    "https://bioprotocols.org/labop/primitives/liquid_handling/Provision": ProvisionUpdater,
+    "https://bioprotocols.org/labop/primitives/liquid_handling/SerialDilution": SerialDilutionUpdater,
+}.items():
+    register_updater(behavior, updater)
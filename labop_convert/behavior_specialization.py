@@ -77,6 +77,18 @@ class BehaviorSpecialization(ABC):
             ) as f:
                 f.write(self.data)
 
+    def processes_record_only(self, behavior: str) -> bool:
+        """
+        Check whether processing an execution of behavior only reads its
+        record, i.e., it is saved by handle(), so that the result does not depend
+        on the other records in the execution.
+        """
+        return (
+            type(self).process is BehaviorSpecialization.process
+            and type(self).handle is BehaviorSpecialization.handle
+            and self._behavior_func_map.get(behavior, self.handle) == self.handle
+        )
+
     def process(self, record, execution: ProtocolExecution, timepoint="start"):
         try:
             node = record.node.lookup()
@@ -0,0 +1,261 @@
+import tempfile
+import unittest
+
+import numpy as np
+import sbol3
+import xarray as xr
+
+import labop
+import uml
+from labop.data import (
+    NPZ_TAG,
+    cached_deserialize_sample_format,
+    deserialize_sample_format,
+    document_index,
+    humanize_values,
+    serialize_sample_format,
+    set_serialization_format,
+    sort_samples,
+)
+from labop.execution_engine import ExecutionEngine
+from labop.strings import Strings
+
+
+class TestSampleFormatSerialization(unittest.TestCase):
+    def setUp(self):
+        locations = ["A1", "A2", "B1", "B2"]
+        self.data_array = xr.DataArray(
+            [[1.0, 2.0, np.nan, 4.0]],
+            dims=(Strings.SAMPLE, Strings.LOCATION),
+            coords={
+                Strings.SAMPLE: ["s1"],
+                Strings.LOCATION: locations,
+            },
+            attrs={"units": "uL"},
+        )
+        self.dataset = xr.Dataset(
+            {
+                Strings.CONTENTS: self.data_array,
+                Strings.SAMPLE_LOCATION: xr.DataArray(
+                    ["A1"], dims=(Strings.SAMPLE), coords={Strings.SAMPLE: ["s1"]}
+                ),
+            }
+        )
+
+    def tearDown(self):
+        set_serialization_format(Strings.JSON)
+
+    def test_npz_round_trip(self):
+        for data in [self.data_array, self.dataset]:
+            encoded = serialize_sample_format(data, serialization_format=Strings.NPZ)
+            assert encoded.startswith(NPZ_TAG)
+            decoded = deserialize_sample_format(encoded)
+            xr.testing.assert_identical(
+                decoded, deserialize_sample_format(serialize_sample_format(data))
+            )
+
+    def test_serialization_format_setting(self):
+        set_serialization_format(Strings.NPZ)
+        assert serialize_sample_format(self.data_array).startswith(NPZ_TAG)
+        # Values that need pickling fall back to JSON
+        with_none = xr.DataArray([None, "a"], dims=(Strings.LOCATION))
+        assert not serialize_sample_format(with_none).startswith(NPZ_TAG)
+        # Plain dicts are always JSON
+        assert not serialize_sample_format({"A1": None}).startswith(NPZ_TAG)
+
+        set_serialization_format(Strings.JSON)
+        encoded = serialize_sample_format(self.data_array)
+        assert not encoded.startswith(NPZ_TAG)
+        xr.testing.assert_identical(
+            deserialize_sample_format(encoded),
+            deserialize_sample_format(
+                serialize_sample_format(
+                    self.data_array, serialization_format=Strings.NPZ
+                )
+            ),
+        )
+
+        with self.assertRaises(ValueError):
+            set_serialization_format("unknown")
+
+    def test_engine_serialization_format(self):
+        labop.import_library("sample_arrays")
+
+        def execute(serialization_format=Strings.JSON):
+            protocol, _ = labop.Protocol.initialize_protocol()
+            protocol.primitive_step(
+                "EmptyContainer", specification=labop.ContainerSpec("deep96")
+            )
+            with tempfile.TemporaryDirectory() as out_dir:
+                ee = ExecutionEngine(
+                    use_ordinal_time=True,
+                    out_dir=out_dir,
+                    track_samples=False,
+                    serialization_format=serialization_format,
+                )
+                ex = ee.execute(
+                    protocol,
+                    sbol3.Agent("test_agent"),
+                    id="test_execution",
+                    parameter_values=[],
+                )
+            return [
+                pv.value.value.lookup().initial_contents
+                for record in ex.executions
+                if isinstance(record, labop.CallBehaviorExecution)
+                for pv in record.call.lookup().parameter_values
+                if isinstance(pv.value.value.lookup(), labop.SampleArray)
+            ]
+
+        [npz_contents] = execute(serialization_format=Strings.NPZ)
+        assert npz_contents.startswith(NPZ_TAG)
+        # The format of one engine does not apply after its execution or to other engines
+        assert not serialize_sample_format(self.data_array).startswith(NPZ_TAG)
+        set_serialization_format(Strings.NPZ)
+        [json_contents] = execute()
+        assert not json_contents.startswith(NPZ_TAG)
+        assert serialize_sample_format(self.data_array).startswith(NPZ_TAG)
+        xr.testing.assert_identical(
+            deserialize_sample_format(npz_contents),
+            deserialize_sample_format(json_contents),
+        )
+
+    def test_deserialization_cache(self):
+        cached_deserialize_sample_format.cache_clear()
+        encoded = serialize_sample_format(self.data_array)
+        first = deserialize_sample_format(encoded)
+        # Modifying a result does not modify the cached value
+        first.coords[Strings.SAMPLE] = ["s2"]
+        second = deserialize_sample_format(encoded)
+        assert cached_deserialize_sample_format.cache_info().hits == 1
+        assert second.coords[Strings.SAMPLE].values.tolist() == ["s1"]
+
+        # A new serialized value is a cache miss
+        changed = deserialize_sample_format(
+            serialize_sample_format(self.data_array * 2)
+        )
+        assert cached_deserialize_sample_format.cache_info().misses == 2
+        assert float(changed.sel(location="A2")) == 4.0
+
+    def test_sort_samples(self):
+        data = xr.DataArray(
+            range(6),
+            dims=(Strings.LOCATION),
+            coords={Strings.LOCATION: ["B10", "A2", "B1", "A10", "B2", "A1"]},
+        )
+        expected = {
+            Strings.ROW_DIRECTION: ["A1", "A2", "A10", "B1", "B2", "B10"],
+            Strings.REVERSE_ROW_DIRECTION: ["A10", "A2", "A1", "B10", "B2", "B1"],
+            Strings.COLUMN_DIRECTION: ["A1", "B1", "A2", "B2", "A10", "B10"],
+            Strings.REVERSE_COLUMN_DIRECTION: ["B1", "A1", "B2", "A2", "B10", "A10"],
+        }
+        for order, locations in expected.items():
+            sorted_data = sort_samples(data, order=order)
+            assert sorted_data.coords[Strings.LOCATION].values.tolist() == locations
+            assert sorted_data.sel(location="B10") == 0
+
+        # Labels that are not plate coordinates are sorted as before, by their
+        # first character and by the rest of the label
+        data = xr.DataArray(
+            range(5),
+            dims=(Strings.LOCATION),
+            coords={Strings.LOCATION: ["tube2", "rack", "B1", "tube10", "A1"]},
+        )
+        expected = {
+            Strings.ROW_DIRECTION: ["A1", "B1", "rack", "tube10", "tube2"],
+            Strings.REVERSE_ROW_DIRECTION: ["A1", "B1", "rack", "tube2", "tube10"],
+            Strings.COLUMN_DIRECTION: ["A1", "B1", "rack", "tube10", "tube2"],
+            Strings.REVERSE_COLUMN_DIRECTION: ["B1", "A1", "rack", "tube10", "tube2"],
+        }
+        for order, locations in expected.items():
+            sorted_data = sort_samples(data, order=order)
+            assert sorted_data.coords[Strings.LOCATION].values.tolist() == locations
+            assert sorted_data.sel(location="tube2") == 0
+
+    def test_json_dict(self):
+        assert deserialize_sample_format(serialize_sample_format({"A1": None})) == {
+            "A1": None
+        }
+
+    def test_humanize_values(self):
+        sbol3.set_namespace("https://example.org")
+        doc = sbol3.Document()
+        plate, tube = labop.ContainerSpec("plate"), labop.ContainerSpec("tube")
+        execution = labop.ProtocolExecution("execution")
+        for obj in [plate, tube, execution]:
+            doc.add(obj)
+        execution.parameter_values = [
+            labop.ParameterValue(value=uml.LiteralReference(value=spec))
+            for spec in [plate, tube]
+        ]
+        index = document_index(doc)
+        for obj in [plate, execution, execution.parameter_values[1].value]:
+            for key in [obj.identity, obj.display_id]:
+                self.assertIs(index[key], doc.find(key))
+        # Objects added beneath objects already in the document are indexed
+        added = labop.ParameterValue(value=uml.LiteralReference(value=tube))
+        execution.parameter_values.append(added)
+        self.assertIs(document_index(doc)[added.identity], added)
+
+        values = np.array(
+            [[plate.identity, "other"], [np.nan, tube.identity]], dtype=object
+        )
+        humanized = humanize_values(values, index)
+        self.assertEqual(humanized[0].tolist(), [str(plate), "other"])
+        self.assertTrue(np.isnan(humanized[1, 0]))
+        self.assertEqual(humanized[1, 1], str(tube))
+        humanized = humanize_values(np.array([tube.identity, "other"]), index)
+        self.assertEqual(humanized.dtype.kind, "U")
+        self.assertIsNone(humanize_values(np.array(["other"]), index))
+        self.assertIsNone(humanize_values(np.array([1.0]), index))
+
+
+class TestDatasetViews(unittest.TestCase):
+    def test_nested_dataset_views(self):
+        sbol3.set_namespace("https://example.org")
+        doc = sbol3.Document()
+        samples = ["A1", "A2", "B1"]
+        metadata = [
+            labop.SampleMetadata(
+                descriptions=serialize_sample_format(
+                    xr.Dataset(
+                        {
+                            name: xr.DataArray(
+                                values,
+                                dims=Strings.SAMPLE,
+                                coords={Strings.SAMPLE: samples},
+                            )
+                        }
+                    )
+                )
+            )
+            for name, values in [
+                ("volume", [1.0, 2.0, 3.0]),
+                ("strain", ["a", "b", "c"]),
+            ]
+        ]
+        nested = labop.Dataset(metadata=[metadata[0]])
+        dataset = labop.Dataset()
+        execution = labop.ProtocolExecution("execution")
+        doc.add(execution)
+        execution.parameter_values = [
+            labop.ParameterValue(value=uml.LiteralIdentified(value=v))
+            for v in [nested, dataset, metadata[1]]
+        ]
+        # The nested metadata is also linked directly
+        dataset.dataset = [nested]
+        dataset.linked_metadata = [metadata[1], nested.metadata[0]]
+
+        self.assertEqual(len(dataset.components()), 2)
+        joined = dataset.to_dataset()
+        self.assertEqual(list(joined.data_vars), ["volume", "strain"])
+        view = dataset.to_dataset(
+            variables=["strain"], samples={Strings.SAMPLE: ["B1", "A2"]}
+        )
+        xr.testing.assert_identical(
+            view, joined[["strain"]].sel({Strings.SAMPLE: ["A2", "B1"]})
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
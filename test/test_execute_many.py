@@ -0,0 +1,51 @@
+import os
+import unittest
+
+import sbol3
+
+import labop
+from labop.execution_engine import ExecutionEngine
+
+OUT_DIR = os.path.join(os.path.dirname(__file__), "out")
+if not os.path.exists(OUT_DIR):
+    os.mkdir(OUT_DIR)
+
+labop.import_library("sample_arrays")
+
+
+class TestExecuteMany(unittest.TestCase):
+    def test_execute_many(self):
+        protocol, doc = labop.Protocol.initialize_protocol()
+        protocol.primitive_step(
+            "EmptyContainer", specification=labop.ContainerSpec("deep96")
+        )
+
+        ee = ExecutionEngine(
+            use_ordinal_time=True, out_dir=OUT_DIR, track_samples=False
+        )
+        executions = ee.execute_many(
+            protocol,
+            sbol3.Agent("test_agent"),
+            [[], [], []],
+            ids=["test_execution1", "test_execution2", "test_execution3"],
+        )
+
+        self.assertListEqual(
+            [ex.display_id for ex in executions],
+            ["test_execution1", "test_execution2", "test_execution3"],
+        )
+        for ex in executions:
+            self.assertIn(ex, doc.objects)
+            self.assertEqual(len(ex.executions), len(executions[0].executions))
+        self.assertEqual(ee.batch_timing["executions"], 3)
+        self.assertGreaterEqual(
+            ee.batch_timing["total"],
+            ee.batch_timing["validation"] + ee.batch_timing["execution"],
+        )
+
+        with self.assertRaises(ValueError):
+            ee.execute_many(protocol, sbol3.Agent("test_agent"), [[]], ids=[])
+
+
+if __name__ == "__main__":
+    unittest.main()
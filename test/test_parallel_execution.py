@@ -0,0 +1,161 @@
+import os
+import unittest
+
+import sbol3
+from tyto import OM
+
+import labop
+from labop import Protocol
+from labop.execution_engine import ExecutionEngine
+from labop_convert import MarkdownSpecialization
+from labop_convert.behavior_specialization import DefaultBehaviorSpecialization
+
+OUT_DIR = os.path.join(os.path.dirname(__file__), "out")
+if not os.path.exists(OUT_DIR):
+    os.mkdir(OUT_DIR)
+
+
+def execute_measurement_protocol(parallel: bool) -> str:
+    protocol, doc = Protocol.initialize_protocol()
+    protocol.name = "parallel_execution_protocol"
+
+    create_source = protocol.primitive_step(
+        "EmptyContainer", specification=labop.ContainerSpec("deep96")
+    )
+    # Both steps consume the samples of create_source, so they become ready together
+    load_excel = protocol.primitive_step(
+        "ExcelMetadata",
+        for_samples=create_source.output_pin("samples"),
+        filename="test/metadata/measure_absorbance.xlsx",
+    )
+    create_coordinates = protocol.primitive_step(
+        "PlateCoordinates",
+        source=create_source.output_pin("samples"),
+        coordinates="A1:B12",
+    )
+    measure_absorbance = protocol.primitive_step(
+        "MeasureAbsorbance",
+        samples=create_coordinates.output_pin("samples"),
+        wavelength=sbol3.Measure(600, OM.nanometer),
+    )
+    meta1 = protocol.primitive_step(
+        "JoinMetadata",
+        dataset=measure_absorbance.output_pin("measurements"),
+        metadata=load_excel.output_pin("metadata"),
+    )
+    outnode = protocol.designate_output(
+        "dataset",
+        "http://bioprotocols.org/labop#Dataset",
+        source=meta1.output_pin("enhanced_dataset"),
+    )
+    protocol.order(outnode, protocol.final())
+
+    ee = ExecutionEngine(
+        failsafe=False,
+        use_ordinal_time=True,
+        out_dir=OUT_DIR,
+        track_samples=False,
+        parallel=parallel,
+        max_workers=4,
+    )
+    ee.execute(
+        protocol,
+        sbol3.Agent("test_agent"),
+        id="test_execution",
+        parameter_values=[],
+    )
+    return doc.write_string(sbol3.SORTED_NTRIPLES)
+
+
+class TraceSpecialization(DefaultBehaviorSpecialization):
+    """Save the records in the execution when each PlateCoordinates is processed"""
+
+    def _init_behavior_func_map(self) -> dict:
+        return {
+            **super()._init_behavior_func_map(),
+            "https://bioprotocols.org/labop/primitives/sample_arrays/PlateCoordinates": self.trace,
+        }
+
+    def trace(self, record, execution):
+        self.data.append([e.display_id for e in execution.executions])
+
+
+def execute_concurrent_protocol(parallel: bool, specialization) -> tuple:
+    protocol, doc = Protocol.initialize_protocol()
+    protocol.name = "concurrent_execution_protocol"
+
+    create_source = protocol.primitive_step(
+        "EmptyContainer", specification=labop.ContainerSpec("deep96")
+    )
+    # Unordered steps on the same samples become ready together
+    for coordinates in ["A1:A12", "B1:B12"]:
+        create_coordinates = protocol.execute_primitive(
+            "PlateCoordinates",
+            source=create_source.output_pin("samples"),
+            coordinates=coordinates,
+        )
+        protocol.execute_primitive(
+            "MeasureAbsorbance",
+            samples=create_coordinates.output_pin("samples"),
+            wavelength=sbol3.Measure(600, OM.nanometer),
+        )
+
+    ee = ExecutionEngine(
+        specializations=[specialization],
+        failsafe=False,
+        use_ordinal_time=True,
+        out_dir=OUT_DIR,
+        track_samples=False,
+        parallel=parallel,
+        max_workers=4,
+    )
+    ee.execute(
+        protocol,
+        sbol3.Agent("test_agent"),
+        id="test_execution",
+        parameter_values=[],
+    )
+    return ee, specialization.data
+
+
+class TestParallelExecution(unittest.TestCase):
+    def test_parallel_matches_serial(self):
+        serial = execute_measurement_protocol(parallel=False)
+        parallel = execute_measurement_protocol(parallel=True)
+        assert serial == parallel, "Parallel execution trace differs from serial"
+
+    def test_parallel_specializations_match_serial(self):
+        markdown_file = os.path.join(OUT_DIR, "concurrent_execution_protocol.md")
+        for make_specialization in [
+            DefaultBehaviorSpecialization,
+            TraceSpecialization,
+            lambda: MarkdownSpecialization(markdown_file),
+        ]:
+            _, serial = execute_concurrent_protocol(False, make_specialization())
+            ee, parallel = execute_concurrent_protocol(True, make_specialization())
+            # The Markdown ends with the time that it was written
+            serial, parallel = [
+                "\n".join(
+                    line
+                    for line in data.splitlines()
+                    if not line.startswith("Timestamp:")
+                )
+                for data in [serial, parallel]
+            ]
+            self.assertEqual(serial, parallel)
+
+            # Only steps that specializations process from their record alone are
+            # computed concurrently
+            plate_coordinates = next(
+                node
+                for node in ee.ex.protocol.lookup().nodes
+                if str(getattr(node, "behavior", "")).endswith("PlateCoordinates")
+            )
+            self.assertEqual(
+                ee.is_parallelizable(plate_coordinates),
+                make_specialization is DefaultBehaviorSpecialization,
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
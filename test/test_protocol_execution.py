@@ -0,0 +1,107 @@
+import inspect
+import io
+import sys
+import unittest
+
+import sbol3
+from tyto import OM
+
+import labop
+import uml
+from uml import labop_hash
+
+
+class TestProtocolExecution(unittest.TestCase):
+    def setUp(self):
+        self.protocol, self.doc = labop.Protocol.initialize_protocol()
+        self.ex = labop.ProtocolExecution("test_execution", protocol=self.protocol)
+        self.doc.add(self.ex)
+
+    def test_invocation_hash(self):
+        primitive = labop.Primitive("Incubate")
+        primitive.add_input("duration", sbol3.OM_MEASURE)
+        self.doc.add(primitive)
+        step = self.protocol.primitive_step(
+            primitive, duration=sbol3.Measure(1, OM.hour)
+        )
+        call = labop.BehaviorExecution(
+            "call",
+            parameter_values=[
+                labop.ParameterValue(
+                    parameter=primitive.parameters[0],
+                    value=uml.literal(sbol3.Measure(1, OM.hour)),
+                )
+            ],
+        )
+        self.doc.add(call)
+        self.ex.executions = [
+            labop.ActivityNodeExecution(node=self.protocol.initial()),
+            labop.CallBehaviorExecution(node=step, call=call),
+        ]
+
+        # The invocation hash is the digest of the identities of the execution, its node
+        # and its parameter values
+        for record in self.ex.executions:
+            parameter_values = (
+                record.parameter_values()
+                if isinstance(record, labop.CallBehaviorExecution)
+                else []
+            )
+            self.assertEqual(
+                record.invocation_hash(),
+                hash(
+                    labop_hash(record.identity)
+                    + hash(record.get_node())
+                    + sum([hash(labop_hash(pv.identity)) for pv in parameter_values])
+                ),
+            )
+            self.assertIn(record, set(self.ex.executions))
+        self.assertIn(call.parameter_values[0], set(call.parameter_values))
+
+    def test_long_trace(self):
+        nodes = [self.protocol.initial(), self.protocol.final()]
+        self.ex.executions = [
+            labop.ActivityNodeExecution(node=nodes[i % 2]) for i in range(200)
+        ]
+
+        # The trace is longer than the recursion limit allows above this frame
+        recursion_limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(len(inspect.stack(0)) + 100)
+        try:
+            nodes, records = self.ex.backtrace()
+            # Streamed JSON matches the JSON string
+            stream = io.StringIO()
+            self.ex.to_json(stream=stream)
+            json_string = self.ex.to_json()
+        finally:
+            sys.setrecursionlimit(recursion_limit)
+        self.assertEqual(nodes, {self.protocol.initial(), self.protocol.final()})
+        self.assertEqual(len(records), len(self.ex.executions))
+        self.assertEqual(stream.getvalue(), json_string)
+
+    def test_unbound_parameters(self):
+        inputs = [
+            self.protocol.input_value(name, sbol3.OM_MEASURE) for name in ["x", "y"]
+        ]
+        parameters = [node.parameter.lookup() for node in inputs]
+        self.ex.executions = [labop.ActivityNodeExecution(node=node) for node in inputs]
+        self.ex.parameter_values = [
+            labop.ParameterValue(parameter=parameters[0], value=uml.literal(1))
+        ]
+        self.assertEqual(self.ex.unbound_inputs(), [parameters[1].property_value])
+        self.assertEqual(self.ex.unbound_outputs(), [])
+
+        # Changes that keep the number of parameter values or executions are seen
+        self.ex.parameter_values = [
+            labop.ParameterValue(parameter=parameters[1], value=uml.literal(1))
+        ]
+        self.assertEqual(self.ex.unbound_inputs(), [parameters[0].property_value])
+        self.ex.executions[1] = labop.ActivityNodeExecution(node=inputs[0])
+        self.assertEqual(
+            self.ex.unbound_inputs(),
+            [parameters[0].property_value, parameters[0].property_value],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
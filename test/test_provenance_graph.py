@@ -0,0 +1,371 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import xarray as xr
+
+import labop
+from labop.strings import Strings
+from labop_convert.behavior_dynamics import (
+    UPDATERS,
+    BaseUpdater,
+    EmptyContainerUpdater,
+    ProvenanceGraphStore,
+    SampleProvenanceObserver,
+    register_updater,
+)
+
+
+def make_samples(tick, sample_ids, volume):
+    locations = ["A1", "A2"]
+    return xr.Dataset(
+        {
+            Strings.SAMPLE_LOCATION: xr.DataArray(
+                [sample_ids],
+                dims=(Strings.CONTAINER, Strings.LOCATION),
+            ),
+            Strings.CONTENTS: xr.DataArray(
+                [[[volume] for _ in locations]],
+                dims=(Strings.CONTAINER, Strings.LOCATION, Strings.REAGENT),
+            ),
+        },
+        coords={
+            Strings.CONTAINER: ["plate"],
+            Strings.LOCATION: locations,
+            Strings.REAGENT: ["https://example.org/water"],
+            Strings.SAMPLE: sample_ids,
+        },
+    ).expand_dims(dim={"tick": [tick]})
+
+
+def make_edges(edges, label=None):
+    columns = [Strings.SAMPLE_LOCATION, Strings.NEXT_SAMPLE_LOCATION]
+    if label is not None:
+        columns.append("label")
+        edges = [e + [label] for e in edges]
+    return xr.DataArray(
+        edges,
+        dims=(Strings.EDGE, Strings.NODE),
+        coords={Strings.NODE: columns},
+        name=Strings.EDGES,
+    )
+
+
+class TestProvenanceGraphStore(unittest.TestCase):
+    def setUp(self):
+        self.additions = [
+            make_samples(0, ["s0", "s1"], 1.0),
+            xr.merge(
+                [
+                    make_samples(1, ["s2", "s3"], 2.0),
+                    make_edges([["s0", "s2"], ["s1", "s3"]], label="t1"),
+                ]
+            ),
+            xr.merge(
+                [
+                    make_samples(2, ["s4", "s5"], 3.0),
+                    make_edges([["s2", "s4"], ["s3", "s5"], ["s2", None]], "t2"),
+                ]
+            ),
+        ]
+
+    def test_store_matches_update_graph(self):
+        observer = SampleProvenanceObserver(tempfile.gettempdir())
+        store = ProvenanceGraphStore(edge_capacity=1)
+        graph = observer.update_graph(self.additions[0], graph=xr.Dataset())
+        store.append(self.additions[0])
+        for addition in self.additions[1:]:
+            graph = observer.update_graph(addition, graph=graph)
+            store.append(addition)
+            xr.testing.assert_identical(graph, store.to_dataset())
+
+        self.assertEqual(store.to_dataset().tick.values.tolist(), [2, 1, 0])
+        self.assertEqual(store.edges().values[:, 0].tolist(), ["s2", "s3", "s0", "s1"])
+
+    def test_observer_graph(self):
+        observer = SampleProvenanceObserver(tempfile.gettempdir())
+        for addition in self.additions:
+            observer.graph_store.append(addition)
+
+        self.assertEqual(
+            sorted(observer.sample_provenance("s5").values.tolist()),
+            ["s1", "s3", "s5"],
+        )
+        latest = observer.select_samples_from_graph(
+            observer.graph.sel(tick=0, drop=True)
+        )
+        self.assertEqual(latest.sample_location.values.tolist(), [["s4", "s5"]])
+        # The current sample table agrees with a scan of the graph
+        for locations in [["A1"], ["A1", "A2"]]:
+            wells = observer.graph.sel(tick=0, location=locations, drop=True)
+            xr.testing.assert_identical(
+                observer.select_samples_from_graph(wells),
+                observer.select_samples_from_graph(wells, graph=observer.graph),
+            )
+
+        lineage = observer.sample_lineage(["s4", "s5"], depth=1)
+        self.assertEqual(lineage["s4"].values.tolist(), ["s2", "s4"])
+        self.assertEqual(lineage["s5"].values.tolist(), ["s3", "s5"])
+        descendants = observer.sample_lineage(["s0"], descendants=True)
+        self.assertEqual(descendants["s0"].values.tolist(), ["s0", "s2", "s4"])
+
+        # Assigning the graph replaces the store contents
+        observer.graph = self.additions[0]
+        self.assertEqual(len(observer.graph_store), 1)
+        self.assertEqual(observer.graph.tick.values.tolist(), [0])
+
+    def test_snapshots(self):
+        observer = SampleProvenanceObserver(tempfile.gettempdir())
+        graphs = []
+        for tick, addition in enumerate(self.additions):
+            observer.graph_store.append(addition)
+            observer.snapshot_ticks.append((tick, len(observer.graph_store)))
+            graphs.append(observer.graph)
+
+        for tick, graph in enumerate(graphs):
+            xr.testing.assert_identical(observer.snapshot(tick), graph)
+        xr.testing.assert_identical(observer.snapshot(), graphs[-1])
+
+        # Snapshots are rendered by background threads
+        with mock.patch(
+            "graphviz.Digraph.render", side_effect=lambda path: f"{path}.pdf"
+        ):
+            paths = observer.render_snapshots(max_workers=2)
+        self.assertEqual(
+            [os.path.basename(p) for p in paths],
+            ["sample_graph_0.pdf", "sample_graph_1.pdf", "sample_graph_2.pdf"],
+        )
+        self.assertIsNone(observer.render_pool)
+
+    def test_persisted_store(self):
+        with tempfile.TemporaryDirectory() as outdir:
+            observer = SampleProvenanceObserver(outdir, persist=True)
+            additions = iter(self.additions)
+
+            class AdditionUpdater(BaseUpdater):
+                def update(self, record):
+                    return next(additions)
+
+            # Untracked steps do not advance the tick
+            observer.node_updaters["step"] = AdditionUpdater(observer)
+            observer.node_updaters["untracked"] = None
+            store = ProvenanceGraphStore()
+            for node in ["step", "untracked", "step", "step"]:
+                observer.update(mock.Mock(node=node))
+            for addition in self.additions:
+                store.append(addition)
+            xr.testing.assert_identical(observer.graph, store.to_dataset())
+            self.assertEqual(observer.snapshot_ticks, [(0, 1), (1, 2), (2, 3)])
+
+            loaded = SampleProvenanceObserver.load(outdir)
+            xr.testing.assert_identical(loaded.graph, store.to_dataset())
+            self.assertEqual(loaded.graph_store.block_ticks, [0, 1, 2])
+            self.assertEqual(loaded.snapshot_ticks, observer.snapshot_ticks)
+            self.assertEqual(loaded.exec_tick, observer.exec_tick)
+            xr.testing.assert_identical(loaded.snapshot(1), observer.snapshot(1))
+            self.assertEqual(
+                sorted(loaded.sample_provenance("s5").values.tolist()),
+                ["s1", "s3", "s5"],
+            )
+
+            # Strings and edges are written as arrays that can be memory-mapped
+            directory = SampleProvenanceObserver.store_directory(outdir)
+            manifest_path = os.path.join(directory, ProvenanceGraphStore.MANIFEST)
+            with open(manifest_path) as manifest:
+                records = [json.loads(line) for line in manifest]
+            for record in records:
+                for info in list(record["variables"].values()) + [record["edges"]]:
+                    self.assertNotEqual(info["encoding"], "pickle")
+            # Missing edge values are restored from the null mask
+            self.assertEqual(records[2]["edges"]["encoding"], "str")
+            self.assertIsNone(loaded.graph_store.edge_table)
+
+            # A partially written block is dropped, and a new observer continues the graph
+            with open(manifest_path, "a") as manifest:
+                manifest.write('{"block": ')
+            observer = SampleProvenanceObserver(outdir, persist=True)
+            self.assertEqual(len(observer.graph_store), len(self.additions))
+            observer.node_updaters["step"] = AdditionUpdater(observer)
+            additions = iter([make_samples(3, ["s6", "s7"], 4.0)])
+            observer.update(mock.Mock(node="step"))
+            loaded = SampleProvenanceObserver.load(outdir)
+            self.assertEqual(loaded.snapshot_ticks, [(0, 1), (1, 2), (2, 3), (3, 4)])
+            xr.testing.assert_identical(loaded.graph, observer.graph)
+
+    def test_updater_registry(self):
+        labop.import_library("sample_arrays")
+        protocol, _ = labop.Protocol.initialize_protocol()
+        empty = protocol.primitive_step(
+            "EmptyContainer", specification=labop.ContainerSpec("deep96")
+        )
+        measure = protocol.primitive_step(
+            "PlateCoordinates",
+            source=empty.output_pin("samples"),
+            coordinates="A1:B12",
+        )
+
+        observer = SampleProvenanceObserver(tempfile.gettempdir())
+        updater = observer.updater_for(empty)
+        self.assertIsInstance(updater, EmptyContainerUpdater)
+        # Updaters are instantiated once per observer
+        self.assertIs(updater, observer.updater_for(empty))
+        self.assertIsNone(observer.updater_for(measure))
+        self.assertIsNone(observer.updater_for(protocol.initial()))
+
+        behavior = measure.behavior
+        try:
+
+            @register_updater(behavior)
+            class CoordinatesUpdater(BaseUpdater):
+                def update(self, record):
+                    pass
+
+            self.assertIsInstance(
+                SampleProvenanceObserver(tempfile.gettempdir()).updater_for(measure),
+                CoordinatesUpdater,
+            )
+        finally:
+            del UPDATERS[str(behavior)]
+
+
+class TestTransferPlans(unittest.TestCase):
+    def test_transfer_plans(self):
+        observer = SampleProvenanceObserver(tempfile.gettempdir())
+        reagents = ["water", "dye"]
+        # B1 is empty, as is A1 of the target plate
+        source = xr.Dataset(
+            {
+                Strings.SAMPLE_LOCATION: xr.DataArray(
+                    [["s0", "s1", "s2"]], dims=(Strings.CONTAINER, Strings.LOCATION)
+                ),
+                Strings.CONTENTS: xr.DataArray(
+                    [[[30.0, 10.0], [20.0, np.nan], [np.nan, np.nan]]],
+                    dims=(Strings.CONTAINER, Strings.LOCATION, Strings.REAGENT),
+                ),
+            },
+            coords={
+                Strings.CONTAINER: ["plate"],
+                Strings.LOCATION: ["A1", "A2", "B1"],
+                Strings.REAGENT: reagents,
+            },
+        )
+        target = xr.Dataset(
+            {
+                Strings.SAMPLE_LOCATION: xr.DataArray(
+                    [["t0", "t1"]], dims=(Strings.CONTAINER, Strings.LOCATION)
+                ),
+                Strings.CONTENTS: xr.DataArray(
+                    [[[np.nan, np.nan], [5.0, np.nan]]],
+                    dims=(Strings.CONTAINER, Strings.LOCATION, Strings.REAGENT),
+                ),
+            },
+            coords={
+                Strings.CONTAINER: ["target_plate"],
+                Strings.LOCATION: ["A1", "A2"],
+                Strings.REAGENT: reagents,
+            },
+        )
+
+        # Transfer 4 from each source to each target.  The expected contents and
+        # edges are those of the dense plan arithmetic that the plans replaced.
+        plan = observer.make_transfer_array(source, target, 4.0)
+        addition = observer.compute_transfer(
+            labop.SampleArray(name="source"),
+            source,
+            labop.SampleArray(name="target"),
+            target,
+            plan,
+        )
+        contents = addition.contents.squeeze("tick").transpose(
+            Strings.CONTAINER, Strings.LOCATION, Strings.REAGENT
+        )
+        np.testing.assert_array_equal(
+            contents.values,
+            [
+                [[24.0, 8.0], [12.0, np.nan], [np.nan, np.nan]],
+                [[7.0, 1.0], [12.0, 1.0], [np.nan, np.nan]],
+            ],
+        )
+        edges = [tuple(edge) for edge in addition.edges.values.tolist()]
+        self.assertEqual(len(edges), len(set(edges)))
+        self.assertEqual(
+            set(edges),
+            {
+                ("s0", "sample_source_0"),
+                ("s1", "sample_source_1"),
+                ("s2", "sample_source_2"),
+                ("t0", "sample_target_0"),
+                ("t1", "sample_target_1"),
+            }
+            | {
+                (s, t)
+                for s in ["s0", "s1", "s2"]
+                for t in ["sample_target_0", "sample_target_1"]
+            },
+        )
+
+        # A1 -> A2 and A2 -> A1, as a dense and as a sparse plan
+        source = make_samples(0, ["s0", "s1"], 100.0).squeeze("tick", drop=True)
+        target = make_samples(0, ["s2", "s3"], 0.0).squeeze("tick", drop=True)
+        target[Strings.CONTENTS] = target.contents.where(target.contents > 0)
+        target = target.assign_coords({Strings.CONTAINER: ["target_plate"]})
+        dense = xr.DataArray(
+            [[[[0.0, 10.0]], [[5.0, 0.0]]]],
+            dims=(
+                Strings.SOURCE_CONTAINER,
+                Strings.SOURCE_LOCATION,
+                Strings.TARGET_CONTAINER,
+                Strings.TARGET_LOCATION,
+            ),
+            coords={
+                Strings.SOURCE_CONTAINER: ["plate"],
+                Strings.SOURCE_LOCATION: ["A1", "A2"],
+                Strings.TARGET_CONTAINER: ["target_plate"],
+                Strings.TARGET_LOCATION: ["A1", "A2"],
+            },
+        )
+        sparse = observer.sparse_transfer_array(
+            [10.0, 5.0],
+            ["plate", "plate"],
+            ["A1", "A2"],
+            ["target_plate", "target_plate"],
+            ["A2", "A1"],
+        )
+        for plan in [dense, sparse]:
+            addition = observer.compute_transfer(
+                labop.SampleArray(name="source"),
+                source,
+                labop.SampleArray(name="target"),
+                target,
+                plan,
+            )
+            contents = addition.contents.squeeze("tick")
+            self.assertEqual(
+                contents.sel(container="plate").values.ravel().tolist(), [90.0, 95.0]
+            )
+            self.assertEqual(
+                contents.sel(container="target_plate").values.ravel().tolist(),
+                [5.0, 10.0],
+            )
+            transfer_edges = addition.edges.values[4:].tolist()
+            self.assertEqual(
+                transfer_edges,
+                [["s0", "sample_target_1"], ["s1", "sample_target_0"]],
+            )
+
+    def test_new_sample_ids(self):
+        samples = labop.SampleArray(name="plate")
+        self.assertEqual(samples.new_sample_id(), "sample_plate_0")
+        self.assertEqual(
+            samples.new_sample_ids(3).tolist(),
+            ["sample_plate_1", "sample_plate_2", "sample_plate_3"],
+        )
+        self.assertEqual(samples.new_sample_ids(0).tolist(), [])
+        self.assertEqual(samples.new_sample_id(), "sample_plate_4")
+
+
+if __name__ == "__main__":
+    unittest.main()
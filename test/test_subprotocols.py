@@ -6,6 +6,42 @@ import labop
 from labop.execution_engine import ExecutionEngine
 
 
+def linear_ordered_executions(ex):
+    # Successor of each execution found by scanning the executions and their flows
+    execution = next(
+        x for x in ex.executions if x.node == ex.protocol.lookup().initial().identity
+    )
+    ordered = []
+    while execution is not None:
+        execution = next(
+            (
+                x
+                for x in ex.executions
+                for f in x.incoming_flows
+                if f.lookup().token_source == execution.identity
+            ),
+            None,
+        )
+        if execution is not None:
+            ordered.append(execution)
+    return ordered
+
+
+def linear_subprotocol_executions(ex):
+    subprotocols = [
+        x.node.lookup().behavior
+        for x in linear_ordered_executions(ex)
+        if isinstance(x, labop.CallBehaviorExecution)
+        and isinstance(x.node.lookup().behavior.lookup(), labop.Protocol)
+    ]
+    return [
+        o
+        for x in subprotocols
+        for o in ex.document.objects
+        if type(o) is labop.ProtocolExecution and o.protocol == x
+    ]
+
+
 class TestSubprotocols(unittest.TestCase):
     def test_subexecutions(self):
         protocol, doc = labop.Protocol.initialize_protocol(
@@ -59,6 +95,18 @@ class TestSubprotocols(unittest.TestCase):
                 [x.protocol.lookup() for x in subprotocol_executions],
                 [subprotocol1, subprotocol2],
             )
+            self.assertListEqual(
+                subprotocol_executions, linear_subprotocol_executions(ex)
+            )
+
+        # The cached index follows the executions as they grow
+        flow = labop.ActivityEdgeFlow(token_source=ordered_executions[-1])
+        ex.flows.append(flow)
+        ex.executions.append(
+            labop.ActivityNodeExecution(node=protocol.final(), incoming_flows=[flow])
+        )
+        self.assertListEqual(ex.get_ordered_executions(), linear_ordered_executions(ex))
+        self.assertEqual(len(ex.get_ordered_executions()), len(ordered_executions) + 1)
 
 
 if __name__ == "__main__":
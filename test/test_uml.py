@@ -1,15 +1,21 @@
 import unittest
+from unittest import mock
 
 import sbol3
 
 from uml import (
+    Activity,
     Behavior,
     Constraint,
+    ForkNode,
     LiteralInteger,
     LiteralNull,
+    ObjectFlow,
     OrderedPropertyValue,
     Parameter,
+    ValuePin,
 )
+from uml.utils import cached_lookups
 
 
 class TestUML(unittest.TestCase):
@@ -67,3 +73,68 @@ class TestUML(unittest.TestCase):
         assert not v.errors and not v.warnings, "".join(
             str(e) for e in doc.validate().errors
         )
+
+    def test_activity_edge_index(self):
+        doc = sbol3.Document()
+        sbol3.set_namespace("https://bbn.com/scratch/")
+        activity = Activity("a")
+        doc.add(activity)
+
+        initial = activity.initial()
+        final = activity.final()
+        flow = activity.order(initial, final)
+        assert activity.outgoing_edges(initial) == {flow}
+        assert activity.incoming_edges(final) == {flow}
+        assert activity.incoming_edges(initial) == set()
+
+        # Edges appended directly to the Activity are picked up by the index
+        source = ValuePin(name="source", value=LiteralInteger(value=1))
+        target1 = ValuePin(name="target1", value=LiteralInteger(value=2))
+        target2 = ValuePin(name="target2", value=LiteralInteger(value=3))
+        activity.nodes += [source, target1, target2]
+        flow1 = ObjectFlow(source=source, target=target1)
+        activity.edges.append(flow1)
+        assert activity.outgoing_edges(source) == {flow1}
+        assert activity.incoming_edges(target1) == {flow1}
+
+        # A second use of source injects a ForkNode and moves flow1 onto it
+        fork = activity.deconflict_objectflow_sources(source)
+        assert isinstance(fork, ForkNode)
+        assert [e.get_target() for e in activity.outgoing_edges(source)] == [fork]
+        assert activity.outgoing_edges(fork) == {flow1}
+
+        activity.set_edge_endpoints(flow1, target=target2)
+        assert activity.incoming_edges(target1) == set()
+        assert activity.incoming_edges(target2) == {flow1}
+
+    def test_cached_lookups(self):
+        doc = sbol3.Document()
+        sbol3.set_namespace("https://bbn.com/scratch/")
+        activity = Activity("a")
+        doc.add(activity)
+        initial = activity.initial()
+        flow = activity.order(initial, activity.final())
+
+        with cached_lookups(doc):
+            self.assertIs(flow.source.lookup(), initial)
+            with mock.patch.object(sbol3.Document, "find") as find:
+                self.assertIs(flow.source.lookup(), initial)
+                find.assert_not_called()
+            # URIs are found by the ReferencedURI itself
+            self.assertIsInstance(flow.source, sbol3.refobj_property.ReferencedURI)
+            self.assertIs(doc.find(flow.source), initial)
+
+            # Objects that are not found are searched for again
+            uri = f"{activity.identity}/ValuePin1"
+            self.assertIsNone(doc.find(uri))
+            pin = ValuePin(name="pin", value=LiteralInteger(value=1))
+            activity.nodes.append(pin)
+            self.assertIs(doc.find(uri), pin)
+
+            # Changes to the document clear the cache
+            other = Activity("b")
+            doc.add(other)
+            self.assertIs(doc.find(other.identity), other)
+            doc.remove([other])
+            self.assertIsNone(doc.find(other.identity))
+        self.assertNotIn("find", vars(doc))
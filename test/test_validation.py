@@ -1,9 +1,13 @@
+import os
+import tempfile
 import unittest
+from unittest import mock
 
 import sbol3
 
 import labop
 from uml import ActivityParameterNode, ObjectFlow
+from uml.utils import WellformednessLevels
 
 
 class TestValidationErrorChecking(unittest.TestCase):
@@ -79,6 +83,64 @@ class TestValidationErrorChecking(unittest.TestCase):
         observed = [str(e) for e in v]
         assert observed == expected, f"Unexpected error content: {observed}"
 
+    def test_well_formedness_cache(self):
+        """Test that well formedness reports are reused until the protocol changes"""
+        protocol, doc = labop.Protocol.initialize_protocol(
+            display_id="cached",
+            name="cached",
+            namespace="https://bbn.com/scratch/",
+        )
+        protocol.primitive_step("EmptyContainer", specification="placeholder")
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            issues = protocol.is_well_formed(cache_dir=cache_dir)
+            [cache_file] = os.listdir(cache_dir)
+            assert cache_file == f"well_formedness_{protocol.content_hash()}.json"
+
+            # Unchanged protocol: the report comes from the in-memory and on-disk caches
+            # Mocks are autospecced, because sbol3 would resolve the _sbol_singleton that a MagicMock has
+            with mock.patch.object(
+                labop.Protocol,
+                "check_well_formed",
+                autospec=True,
+                side_effect=AssertionError,
+            ):
+                cached_issues = protocol.is_well_formed(cache_dir=cache_dir)
+                labop.protocol.WELL_FORMEDNESS_CACHE.clear()
+                stored_issues = protocol.is_well_formed(cache_dir=cache_dir)
+            for reused in [cached_issues, stored_issues]:
+                assert [str(i) for i in reused] == [str(i) for i in issues]
+            # The content hash of an unchanged protocol is not recomputed
+            with mock.patch("rdflib.Graph", side_effect=AssertionError):
+                assert cache_file == f"well_formedness_{protocol.content_hash()}.json"
+
+            # A report that refers to objects missing from the document is recomputed
+            labop.protocol.WELL_FORMEDNESS_CACHE[protocol.content_hash()] = [
+                {
+                    "object": f"{protocol.identity}/missing",
+                    "level": WellformednessLevels.ERROR,
+                    "description": "missing",
+                    "suggestion": None,
+                }
+            ]
+            with mock.patch.object(
+                labop.Protocol, "check_well_formed", autospec=True, return_value=[]
+            ) as check:
+                assert protocol.is_well_formed() == []
+                check.assert_called_once()
+
+            # Changed protocol: the report is recomputed
+            old_hash = protocol.content_hash()
+            protocol.primitive_step("EmptyContainer", specification="placeholder2")
+            assert protocol.content_hash() != old_hash
+            protocol.is_well_formed(cache_dir=cache_dir)
+            assert len(os.listdir(cache_dir)) == 2
+
+        # Only the most recently used reports are kept in memory
+        with mock.patch.object(labop.protocol, "WELL_FORMEDNESS_CACHE_SIZE", 1):
+            protocol.is_well_formed()
+        assert list(labop.protocol.WELL_FORMEDNESS_CACHE) == [protocol.content_hash()]
+
 
 if __name__ == "__main__":
     unittest.main()
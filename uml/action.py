@@ -2,7 +2,7 @@
 The Action class defines the functions corresponding to the dynamically generated labop class Action
 """
 
-from typing import Callable, Dict, List
+from typing import Callable, Dict, Iterable, List, Optional, Set
 
 import sbol3
 
@@ -271,6 +271,38 @@ class Action(inner.Action, ExecutableNode):
         else:
             return control_tokens_present
 
+    def enabling_edges(
+        self,
+        edges: Iterable["ActivityEdge"],
+        engine: "ExecutionEngine",
+    ) -> Optional[Set["ActivityEdge"]]:
+        """Find the incoming edges that must each hold a token for the node to be enabled (see enabled()).
+
+        Parameters
+        ----------
+        self: node to be executed
+        edges: incoming edges of the node
+
+        Returns
+        -------
+        Set of edges, or None if enabled() must be checked directly
+        """
+        control_edges = super().enabling_edges(edges, engine)
+        if engine.permissive:
+            return control_edges
+
+        required_inputs = self.required_inputs()
+        required_value_pins = [p for p in required_inputs if isinstance(p, ValuePin)]
+        if not all([p.enabled(None, engine) for p in required_value_pins]):
+            # An unset ValuePin never becomes enabled
+            return None
+        required_input_pins = [
+            p for p in required_inputs if p not in required_value_pins
+        ]
+        return control_edges | {
+            e for e in edges if any([e.get_source() == p for p in required_input_pins])
+        }
+
     def get_value(
         self,
         edge: "ActivityEdge",
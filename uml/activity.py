@@ -5,7 +5,7 @@ The Activity class defines the functions corresponding to the dynamically genera
 import html
 import logging
 from collections import Counter
-from typing import Iterable, List, Set, Type
+from typing import Dict, Iterable, List, Set, Tuple, Type
 
 import graphviz
 import sbol3
@@ -47,6 +47,7 @@ class Activity(inner.Activity, Behavior):
         super().__init__(*args, **kwargs)
         self._initial = None
         self._final = None
+        self._edge_index = None
 
     def initial(self):
         """Find or create an initial node in an Activity.
@@ -173,9 +174,8 @@ class Activity(inner.Activity, Behavior):
         -------
         Set of ActivityEdges with node as a target
         """
-        return {
-            e for e in self.edges if e.target == node.identity
-        }  # TODO: change to pointer lookup after pySBOL #237
+        _, edges_by_target = self.edge_adjacency()
+        return set(edges_by_target.get(node.identity, []))
 
     def outgoing_edges(self, node: ActivityNode) -> Set[ActivityEdge]:
         """Find the edges that have the designated node as a source
@@ -188,9 +188,65 @@ class Activity(inner.Activity, Behavior):
         -------
         Set of ActivityEdges with node as a source
         """
-        return {
-            e for e in self.edges if e.source == node.identity
-        }  # TODO: change to pointer lookup after pySBOL #237
+        edges_by_source, _ = self.edge_adjacency()
+        return set(edges_by_source.get(node.identity, []))
+
+    def edge_adjacency(
+        self,
+    ) -> Tuple[Dict[str, List[ActivityEdge]], Dict[str, List[ActivityEdge]]]:
+        """Get the index of edges by source and by target identity
+
+        The index is built on first use and then extended with the edges appended to
+        self.edges since the last call, so lookups are O(degree) rather than O(edges).
+        It is rebuilt if edges were removed or the Activity identity changed (which
+        renames every edge endpoint).
+
+        Returns
+        -------
+        Pair of dicts mapping source identity -> edges and target identity -> edges
+        """
+        index = getattr(self, "_edge_index", None)
+        if (
+            index is None
+            or index["count"] > len(self.edges)
+            or index["identity"] != self.identity
+        ):
+            index = {"identity": self.identity, "count": 0, "source": {}, "target": {}}
+            self._edge_index = index
+        if index["count"] < len(self.edges):
+            for edge in self.edges[index["count"] :]:
+                if edge.source:
+                    index["source"].setdefault(str(edge.source), []).append(edge)
+                if edge.target:
+                    index["target"].setdefault(str(edge.target), []).append(edge)
+            index["count"] = len(self.edges)
+        return index["source"], index["target"]
+
+    def set_edge_endpoints(
+        self,
+        edge: ActivityEdge,
+        source: ActivityNode = None,
+        target: ActivityNode = None,
+    ):
+        """Change the source and/or target of an edge in the Activity, keeping the edge index consistent
+
+        Parameters
+        ----------
+        edge: ActivityEdge already in self.edges
+        source: new source for the edge, if not None
+        target: new target for the edge, if not None
+        """
+        edges_by_source, edges_by_target = self.edge_adjacency()
+        if source is not None:
+            if edge.source:
+                edges_by_source[str(edge.source)].remove(edge)
+            edge.source = source
+            edges_by_source.setdefault(str(edge.source), []).append(edge)
+        if target is not None:
+            if edge.target:
+                edges_by_target[str(edge.target)].remove(edge)
+            edge.target = target
+            edges_by_target.setdefault(str(edge.target), []).append(edge)
 
     def deconflict_objectflow_sources(self, source: ActivityNode) -> ActivityNode:
         """Avoid nondeterminism in ObjectFlows by injecting ForkNode objects where necessary
@@ -208,7 +264,8 @@ class Activity(inner.Activity, Behavior):
         if isinstance(source, ForkNode) or isinstance(source, DecisionNode):
             return source
         # Otherwise, find out what targets currently attach:
-        current_outflows = [e for e in self.edges if e.get_source() is source]
+        edges_by_source, _ = self.edge_adjacency()
+        current_outflows = list(edges_by_source.get(source.identity, []))
         # Use original if nothing is attached to it
         if len(current_outflows) == 0:
             # print(f'No prior use of {source.identity}, connecting directly')
@@ -226,7 +283,9 @@ class Activity(inner.Activity, Behavior):
             self.nodes.append(fork)
             self.edges.append(ObjectFlow(source=source, target=fork))
             for f in current_outflows:
-                f.source = fork  # change over the existing flows
+                self.set_edge_endpoints(
+                    f, source=fork
+                )  # change over the existing flows
             return fork
 
     def call_behavior(self, behavior: Behavior, **input_pin_map):
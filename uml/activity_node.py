@@ -4,7 +4,7 @@ The ActivityNode class defines the functions corresponding to the dynamically ge
 
 import html
 import logging
-from typing import Callable, Dict, List
+from typing import Callable, Dict, Iterable, List, Optional, Set
 
 import graphviz
 
@@ -95,6 +95,27 @@ class ActivityNode(inner.ActivityNode, WhereDefinedMixin):
         incoming_controls = {e for e in edge_values if isinstance(e, ControlFlow)}
         return all([len(edge_values[ic]) > 0 for ic in incoming_controls])
 
+    def enabling_edges(
+        self,
+        edges: Iterable["ActivityEdge"],
+        engine: "ExecutionEngine",
+    ) -> Optional[Set["ActivityEdge"]]:
+        """Find the incoming edges that must each hold a token for the node to be enabled.
+        This is the counterpart of enabled() that lets an ExecutionContext track readiness incrementally.
+
+        Parameters
+        ----------
+        self: node to be executed
+        edges: incoming edges of the node
+
+        Returns
+        -------
+        Set of edges, or None if enabled() must be checked directly
+        """
+        from .control_flow import ControlFlow
+
+        return {e for e in edges if isinstance(e, ControlFlow)}
+
     # def execute(
     #     self,
     #     edge_values: Dict["ActivityEdge", List[LiteralSpecification]],
@@ -2,7 +2,7 @@
 The DecisionNode class defines the functions corresponding to the dynamically generated labop class DecisionNode
 """
 
-from typing import Callable, Dict, List
+from typing import Callable, Dict, Iterable, List, Optional, Set
 
 from uml.activity_edge import ActivityEdge
 
@@ -101,6 +101,14 @@ class DecisionNode(inner.DecisionNode, ControlNode):
             and source.get_parent().behavior == self.decision_input
         )
 
+    def enabling_edges(
+        self,
+        edges: Iterable[ActivityEdge],
+        engine: "ExecutionEngine",
+    ) -> Optional[Set[ActivityEdge]]:
+        # Readiness depends upon which of the primary and decision input flows hold tokens, so always use enabled()
+        return None
+
     def enabled(
         self,
         tokens: Dict["ActivityEdge", List[LiteralSpecification]],
@@ -2,7 +2,7 @@
 The MergeNode class defines the functions corresponding to the dynamically generated labop class MergeNode
 """
 
-from typing import Dict, List
+from typing import Dict, Iterable, List, Optional, Set
 
 from uml.literal_specification import LiteralSpecification
 
@@ -29,3 +29,10 @@ class MergeNode(inner.MergeNode, ControlNode):
         return {t.edge.lookup() for t in tokens if t.edge} == protocol.incoming_edges(
             self
         )
+
+    def enabling_edges(
+        self,
+        edges: Iterable["ActivityEdge"],
+        engine: "ExecutionEngine",
+    ) -> Optional[Set["ActivityEdge"]]:
+        return None
@@ -2,7 +2,7 @@
 The ObjectNode class defines the functions corresponding to the dynamically generated labop class ObjectNode
 """
 
-from typing import Dict, List
+from typing import Dict, Iterable, List, Optional, Set
 
 from . import inner
 from .activity_node import ActivityNode
@@ -37,3 +37,10 @@ class ObjectNode(inner.ObjectNode, ActivityNode):
         bool if self is enabled
         """
         return all([len(edge_values[e]) > 0 for e in edge_values]) or engine.permissive
+
+    def enabling_edges(
+        self,
+        edges: Iterable["ActivityEdge"],
+        engine: "ExecutionEngine",
+    ) -> Optional[Set["ActivityEdge"]]:
+        return set() if engine.permissive else set(edges)
@@ -1,10 +1,12 @@
 import dataclasses
 import datetime
+import functools
 import hashlib
 import importlib
 import json
+from contextlib import contextmanager
 from inspect import currentframe, getframeinfo
-from typing import Union
+from typing import Dict, Optional, Union
 
 import sbol3
 
@@ -109,6 +111,103 @@ def labop_hash(obj):
     return j
 
 
+@functools.lru_cache(maxsize=2**16)
+def identity_hash(identity: str) -> int:
+    """
+    labop_hash() of an identity, memoized because the same identities are
+    hashed many times during execution.
+    """
+    return labop_hash(identity)
+
+
+def object_state_hash(obj: sbol3.Identified) -> int:
+    """
+    Hash the property values of obj and of the objects that it owns, which
+    determine the triples that obj serializes to.  This is much cheaper than
+    serializing obj, so it can tell whether a result derived from the triples
+    is still current.  The hash is only comparable within a process.
+    """
+    state = []
+    stack = [obj]
+    while stack:
+        o = stack.pop()
+        state.append(
+            (o.identity, tuple((k, tuple(v)) for k, v in o._properties.items()))
+        )
+        for k, children in o._owned_objects.items():
+            state.append((k, tuple(child.identity for child in children)))
+            stack.extend(children)
+    return hash(tuple(state))
+
+
+# Document methods that change which object a URI resolves to
+LOOKUP_INVALIDATING_METHODS = [
+    "add",
+    "remove",
+    "remove_object",
+    "change_object_namespace",
+    "clear",
+    "migrate",
+]
+
+
+@contextmanager
+def cached_lookups(document: sbol3.Document):
+    """
+    Cache the objects resolved by document.find(), and so by
+    ReferencedURI.lookup(), while in the context.  Each URI is resolved by
+    searching the document once, rather than on every lookup().
+
+    The cache is cleared when the document's objects are added, removed, or
+    renamed with its methods.  Only objects found by identity are cached, and
+    URIs that are not found are searched again on the next lookup, so child
+    objects added to an object in the document are found.  Objects removed
+    from their parent while in the context remain in the cache.
+
+    Parameters
+    ----------
+    document : sbol3.Document
+        document whose lookups are cached
+    """
+    if "find" in vars(document):
+        # Already cached by an enclosing context
+        yield document
+        return
+
+    cache: Dict[str, sbol3.Identified] = {}
+    find = document.find
+
+    def cached_find(search_string: str) -> Optional[sbol3.Identified]:
+        # ReferencedURI is not hashable
+        key = str(search_string)
+        found = cache.get(key)
+        if found is None:
+            found = find(search_string)
+            if found is not None and found.identity == key:
+                cache[key] = found
+        return found
+
+    def invalidating(method):
+        @functools.wraps(method)
+        def invalidate(*args, **kwargs):
+            cache.clear()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                cache.clear()
+
+        return invalidate
+
+    document.find = cached_find
+    for name in LOOKUP_INVALIDATING_METHODS:
+        setattr(document, name, invalidating(getattr(document, name)))
+    try:
+        yield document
+    finally:
+        for name in ["find"] + LOOKUP_INVALIDATING_METHODS:
+            delattr(document, name)
+
+
 def inner_to_outer(inner_class, package="uml"):
     # Convert the inner class into an outer class
     labop_module = importlib.import_module(package)
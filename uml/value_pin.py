@@ -2,7 +2,7 @@
 The ValuePin class defines the functions corresponding to the dynamically generated labop class ValuePin
 """
 
-from typing import Dict, List
+from typing import Dict, Iterable, List, Optional, Set
 
 from uml.pin import Pin
 from uml.utils import WellFormednessError, WellFormednessIssue
@@ -30,6 +30,13 @@ class ValuePin(inner.ValuePin, InputPin):
     ):
         return self.value is not None or engine.permissive
 
+    def enabling_edges(
+        self,
+        edges: Iterable["ActivityEdge"],
+        engine: "ExecutionEngine",
+    ) -> Optional[Set["ActivityEdge"]]:
+        return set() if self.enabled(None, engine) else None
+
     def is_well_formed(self) -> List[WellFormednessIssue]:
         """
         A ValuePin is well formed if: